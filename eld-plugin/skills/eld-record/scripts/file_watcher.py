@@ -0,0 +1,230 @@
+"""Watch a fixed set of files for changes, with inotify or by polling.
+
+`create_watcher()` returns an inotify watcher where the kernel offers one
+(Linux, via ctypes) and a stat-polling watcher otherwise. Both report the
+watched paths that changed; `iter_changes()` debounces them so a burst of
+writes (a branch checkout, a formatter run) arrives as one batch.
+
+inotify watches the parent directory of each file rather than the file, so
+replacements by rename (editors, git) are seen. When a parent directory
+does not exist yet, the nearest existing ancestor is watched and the watch
+moves down as directories appear.
+"""
+
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def stat_signature(path: Path) -> Signature:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class PollingWatcher:
+    """Compares each file's (size, mtime_ns, inode) every `interval` seconds."""
+
+    def __init__(self, paths: Iterable[Path], interval: float = 1.0):
+        self.interval = interval
+        self._signatures: Dict[Path, Signature] = {path: stat_signature(path) for path in paths}
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Changed paths, after at most `timeout` seconds (forever if None)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, previous in self._signatures.items():
+                current = stat_signature(path)
+                if current != previous:
+                    self._signatures[path] = current
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is None:
+                time.sleep(self.interval)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Directory watches covering a set of files, read with select()."""
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    )
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, libc, fd: int, paths: Iterable[Path]):
+        self._libc = libc
+        self.fd = fd
+        self._paths = set(paths)
+        self._dirs: Dict[int, Path] = {}
+        self._wds: Dict[Path, int] = {}
+        # Watched directory -> watched paths at or below it.
+        self._covered: Dict[Path, Set[Path]] = {}
+        # Missing directory on the way to watched paths -> those paths.
+        self._pending: Dict[Path, Set[Path]] = {}
+
+    @classmethod
+    def create(cls, paths: Iterable[Path]) -> Optional["InotifyWatcher"]:
+        """A watcher, or None where inotify is unavailable (non-Linux, seccomp, watch limits)."""
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(cls.IN_NONBLOCK | cls.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        watcher = cls(libc, fd, paths)
+        if not watcher._rewatch():
+            watcher.close()
+            return None
+        return watcher
+
+    def _watch_dir(self, path: Path) -> Path:
+        """Start watching the nearest existing ancestor of `path`; returns that directory."""
+        directory = path.parent
+        while not directory.is_dir() and directory != directory.parent:
+            directory = directory.parent
+        if directory not in self._wds:
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+            if wd < 0:
+                raise OSError(f"inotify_add_watch failed for {directory}")
+            self._dirs[wd] = directory
+            self._wds[directory] = wd
+        return directory
+
+    def _rewatch(self) -> bool:
+        """(Re)assign every path to its deepest existing directory; False if a watch failed."""
+        covered: Dict[Path, Set[Path]] = {}
+        pending: Dict[Path, Set[Path]] = {}
+        try:
+            for path in self._paths:
+                directory = self._watch_dir(path)
+                covered.setdefault(directory, set()).add(path)
+                missing = path.parent
+                while missing != directory and missing != missing.parent:
+                    pending.setdefault(missing, set()).add(path)
+                    missing = missing.parent
+        except OSError:
+            return False
+        for directory in set(self._wds) - set(covered):
+            wd = self._wds.pop(directory)
+            self._dirs.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+        self._covered = covered
+        self._pending = pending
+        return True
+
+    def _read(self) -> Tuple[Set[Path], bool]:
+        changed: Set[Path] = set()
+        rewatch = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = self.EVENT.unpack_from(data, offset)
+                name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0")
+                offset += self.EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were dropped: treat everything as changed.
+                    changed |= self._paths
+                    rewatch = True
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None:
+                    continue
+                if mask & (self.IN_IGNORED | self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    changed |= self._covered.get(directory, set())
+                    rewatch = True
+                    continue
+                target = directory / os.fsdecode(name)
+                if target in self._paths:
+                    changed.add(target)
+                elif target in self._pending:
+                    # A directory on the way to watched files appeared.
+                    changed |= self._pending[target]
+                    rewatch = True
+        return changed, rewatch
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Changed paths, after at most `timeout` seconds (forever if None)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return set()
+            changed, rewatch = self._read()
+            if rewatch:
+                self._rewatch()
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(paths: Iterable[Path], poll_interval: float = 1.0, polling: bool = False):
+    """An inotify watcher for `paths`, or a polling one if inotify is unavailable or `polling` is set."""
+    paths = list(paths)
+    if not polling:
+        watcher = InotifyWatcher.create(paths)
+        if watcher is not None:
+            return watcher
+    return PollingWatcher(paths, poll_interval)
+
+
+def iter_changes(watcher, debounce: float = 0.5, max_delay: float = 5.0) -> Iterator[Set[Path]]:
+    """Batches of changed paths, each yielded once no change arrived for `debounce` seconds.
+
+    `max_delay` bounds how long a continuous stream of changes can hold a batch back.
+    """
+    while True:
+        batch = watcher.wait()
+        started = time.monotonic()
+        while True:
+            remaining = max_delay - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            more = watcher.wait(min(debounce, remaining))
+            if not more:
+                break
+            batch |= more
+        yield batch
@@ -0,0 +1,176 @@
+"""Git-aware content digests for the eld-record scripts (local git only).
+
+In a git work tree, a tracked file that `git diff` does not report is
+byte-for-byte its index blob, and git already knows that from its own stat
+data. `GitSnapshot.worktree()` records the blob id of every such clean
+file, so HashCache can answer from its blob -> digest table and only dirty,
+untracked or never-seen content is read and hashed.
+
+`GitSnapshot.at_revision()` describes a commit instead: every path
+resolves to its blob in that tree, unknown blobs are hashed from
+`git cat-file --batch`, and the working tree is never read: file
+references in claims are resolved against the tree too (`has_path`).
+
+Digests are always over the file content, as scan_project computes them.
+For files under clean/smudge filters or eol conversion the committed
+content differs from the checkout, so `--as-of` digests of such files will
+not match hashes recorded from the working tree.
+"""
+
+import hashlib
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from hashing import READ_SIZE, new_hasher, update_from_file
+
+SUBMODULE_MODE = "160000"
+
+
+def run_git(project_root: Path, *args: str) -> bytes:
+    """stdout of a git command run in `project_root`; raises OSError or CalledProcessError."""
+    return subprocess.run(
+        ["git", "-C", str(project_root), *args],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    ).stdout
+
+
+def is_work_tree(project_root: Path) -> bool:
+    try:
+        return run_git(project_root, "rev-parse", "--is-inside-work-tree").strip() == b"true"
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def split_z(output: bytes) -> Iterator[str]:
+    for entry in output.split(b"\0"):
+        if entry:
+            yield os.fsdecode(entry)
+
+
+class GitSnapshot:
+    """Blob ids for project paths, from the index (clean files only) or from a commit."""
+
+    def __init__(self, project_root: Path, blobs: Dict[Path, str], rev: Optional[str] = None):
+        self.project_root = project_root
+        self.blobs = blobs
+        self.rev = rev
+        self._paths: Optional[Set[str]] = None
+
+    @classmethod
+    def worktree(cls, project_root: Path) -> "GitSnapshot":
+        """Tracked files whose working copy matches the index, from `git ls-files -s`."""
+        blobs: Dict[Path, str] = {}
+        unmerged: Set[Path] = set()
+        for entry in split_z(run_git(project_root, "ls-files", "-s", "-z")):
+            meta, path = entry.split("\t", 1)
+            mode, blob, stage = meta.split(" ")
+            if stage != "0":
+                unmerged.add(project_root / path)
+            elif mode != SUBMODULE_MODE:
+                blobs[project_root / path] = blob
+        # Modified and deleted tracked files (git refreshes racy entries by content).
+        dirty = {project_root / path
+                 for path in split_z(run_git(project_root, "diff", "--name-only", "--relative", "-z"))}
+        for path in dirty | unmerged:
+            blobs.pop(path, None)
+        return cls(project_root, blobs)
+
+    @classmethod
+    def at_revision(cls, project_root: Path, rev: str) -> "GitSnapshot":
+        """Every file in `rev`'s tree under the project root, from `git ls-tree -r`."""
+        blobs: Dict[Path, str] = {}
+        for entry in split_z(run_git(project_root, "ls-tree", "-r", "-z", rev)):
+            meta, path = entry.split("\t", 1)
+            mode, kind, blob = meta.split(" ")
+            if kind == "blob":
+                blobs[project_root / path] = blob
+        return cls(project_root, blobs, rev)
+
+    def blob_for(self, path: Path) -> Optional[str]:
+        return self.blobs.get(path)
+
+    def has_path(self, relative: str) -> bool:
+        """Whether a project-relative posix path is a file, or a directory holding files, in the snapshot.
+
+        Only meaningful for `at_revision` snapshots: a worktree snapshot
+        lists clean tracked files alone.
+        """
+        if self._paths is None:
+            paths: Set[str] = set()
+            for path in self.blobs:
+                rel = path.relative_to(self.project_root).as_posix()
+                paths.add(rel)
+                while "/" in rel:
+                    rel = rel.rsplit("/", 1)[0]
+                    if rel in paths:
+                        break
+                    paths.add(rel)
+            self._paths = paths
+        return relative in self._paths
+
+    def hash_blobs(self, blob_ids: Iterable[str], algorithm: str) -> Dict[str, str]:
+        """Digests of blob contents streamed from one `git cat-file --batch` process."""
+        blob_ids = list(dict.fromkeys(blob_ids))
+        digests: Dict[str, str] = {}
+        if not blob_ids:
+            return digests
+        process = subprocess.Popen(
+            ["git", "-C", str(self.project_root), "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        try:
+            for blob in blob_ids:
+                # One request at a time keeps both pipes from filling up.
+                process.stdin.write(blob.encode() + b"\n")
+                process.stdin.flush()
+                digest = read_batch_object(process.stdout, algorithm)
+                if digest is not None:
+                    digests[blob] = digest
+        finally:
+            process.stdin.close()
+            process.stdout.close()
+            process.wait()
+        return digests
+
+
+def read_batch_object(stream, algorithm: str) -> Optional[str]:
+    """Hash one `cat-file --batch` response; None if the object is missing."""
+    header = stream.readline().split()
+    if len(header) != 3:
+        return None
+    remaining = int(header[2])
+    hasher = new_hasher(algorithm)
+    while remaining:
+        chunk = stream.read(min(READ_SIZE, remaining))
+        if not chunk:
+            raise OSError("git cat-file --batch ended early")
+        hasher.update(chunk)
+        remaining -= len(chunk)
+    stream.read(1)  # trailing newline
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+def hash_with_blob_id(file_path: Path, algorithm: str) -> Tuple[str, str]:
+    """Digest of a file and the git blob id of the bytes read, from one pass over it."""
+    hasher = new_hasher(algorithm)
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        blob = hashlib.sha1(b"blob %d\0" % size)
+        update_from_file(f, size, [hasher, blob])
+    return f"{algorithm}:{hasher.hexdigest()}", blob.hexdigest()
+
+
+def load_snapshot(project_root: Path, rev: Optional[str] = None) -> GitSnapshot:
+    """The work tree snapshot, or `rev`'s tree; ValueError with git's message if git cannot say."""
+    if not is_work_tree(project_root):
+        raise ValueError(f"not inside a git work tree: {project_root}")
+    try:
+        if rev is not None:
+            run_git(project_root, "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}")
+            return GitSnapshot.at_revision(project_root, rev)
+        return GitSnapshot.worktree(project_root)
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode(errors="replace").strip() or f"unknown revision: {rev}"
+        raise ValueError(message) from e
@@ -0,0 +1,270 @@
+"""Persistent stat-keyed content hash cache for the eld-record scripts.
+
+Digests are stored in `<project>/.eld/hash-cache.sqlite`, keyed by path and
+algorithm and validated against the file's size, mtime_ns and inode. A file
+whose stat still matches returns its stored digest without being read, so a
+cached run costs one `stat` per file.
+
+Entries whose stat no longer matches are replaced, and entries for files that
+have disappeared are deleted. A file modified within RACY_WINDOW_NS of the
+moment it was hashed is not cached: on filesystems with coarse timestamps a
+second write in the same tick would leave size and mtime unchanged and the
+stale digest would be trusted.
+
+With a git snapshot attached (see git_index), clean tracked files are
+answered from a second table mapping git blob ids to digests, without a
+`stat`; only files git reports as dirty, untracked files and blobs never
+seen before are hashed. Blob digests are keyed by origin: BLOB_WORKTREE
+digests were read from a checkout whose bytes hashed to the blob id,
+BLOB_COMMIT digests from the object itself (`--as-of`), and neither
+answers for the other.
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from git_index import GitSnapshot, hash_with_blob_id
+from hashing import ALGORITHMS, DEFAULT_ALGORITHM, hash_files, map_files
+
+CACHE_DIR = ".eld"
+CACHE_FILE = "hash-cache.sqlite"
+SCHEMA_VERSION = 3
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (path, algorithm)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    blob TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (blob, algorithm, origin)
+);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+RACY_WINDOW_NS = 2_000_000_000
+BLOB_WORKTREE = "worktree"
+BLOB_COMMIT = "commit"
+
+Identity = Tuple[int, int, int]
+
+
+def cache_path(project_root: Path) -> Path:
+    return project_root / CACHE_DIR / CACHE_FILE
+
+
+def file_identity(stat: os.stat_result) -> Identity:
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class HashCache:
+    """Digest cache for one project. Changes are written in one transaction on close()."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._entries: Dict[Tuple[str, str], Tuple[Identity, str]] = {}
+        self._loaded = False
+        self._upserts: Dict[Tuple[str, str], Tuple[Identity, str]] = {}
+        self._evicted: List[Tuple[str, str]] = []
+        self._blobs: Optional[Dict[Tuple[str, str, str], str]] = None
+        self._new_blobs: Dict[Tuple[str, str, str], str] = {}
+        self.git: Optional[GitSnapshot] = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, project_root: Path) -> "HashCache":
+        path = cache_path(project_root)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=5.0)
+        conn.execute("PRAGMA journal_mode = WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Version 2 blob rows carry no origin; they are only a cache.
+            conn.executescript("DROP TABLE IF EXISTS blobs;" + SCHEMA)
+        return cls(conn)
+
+    def _load(self) -> None:
+        # One scan of the table is cheaper than a query per file when thousands
+        # of claims are validated; the table holds at most one row per project file.
+        for path, algorithm, size, mtime_ns, inode, digest in self._conn.execute(
+            "SELECT path, algorithm, size, mtime_ns, inode, digest FROM hashes"
+        ):
+            self._entries[(path, algorithm)] = ((size, mtime_ns, inode), digest)
+        self._loaded = True
+
+    def lookup(self, path: Path, algorithm: str, identity: Identity) -> Optional[str]:
+        if not self._loaded:
+            self._load()
+        key = (str(path), algorithm)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] == identity:
+            return entry[1]
+        self.evict(path, algorithm)
+        return None
+
+    def store(self, path: Path, algorithm: str, identity: Identity, digest: str, started_ns: int) -> None:
+        if identity[1] >= started_ns - RACY_WINDOW_NS:
+            return
+        key = (str(path), algorithm)
+        self._entries[key] = (identity, digest)
+        self._upserts[key] = (identity, digest)
+
+    def evict(self, path: Path, algorithm: Optional[str] = None) -> None:
+        if not self._loaded:
+            self._load()
+        for name in ALGORITHMS if algorithm is None else (algorithm,):
+            key = (str(path), name)
+            if self._entries.pop(key, None) is not None:
+                self._upserts.pop(key, None)
+                self._evicted.append(key)
+
+    def blob_digest(self, blob: str, algorithm: str, origin: str) -> Optional[str]:
+        if self._blobs is None:
+            self._blobs = {
+                (b, a, o): digest
+                for b, a, o, digest in self._conn.execute("SELECT blob, algorithm, origin, digest FROM blobs")
+            }
+        return self._blobs.get((blob, algorithm, origin))
+
+    def store_blob(self, blob: str, algorithm: str, origin: str, digest: str) -> None:
+        self.blob_digest(blob, algorithm, origin)
+        self._blobs[(blob, algorithm, origin)] = digest
+        self._new_blobs[(blob, algorithm, origin)] = digest
+
+    def hash_files(
+        self,
+        paths: Iterable[Path],
+        algorithm: str = DEFAULT_ALGORITHM,
+        workers: Optional[int] = None,
+        on_error: Callable[[Path, Exception], str] = lambda path, error: "",
+    ) -> Dict[Path, str]:
+        """Like hashing.hash_files, reading only files whose stat changed since they were cached."""
+        if self.git is not None:
+            return self._hash_git(paths, algorithm, workers, on_error)
+        return self._hash_stat(paths, algorithm, workers, on_error)
+
+    def _hash_git(self, paths, algorithm, workers, on_error) -> Dict[Path, str]:
+        results: Dict[Path, str] = {}
+        unknown: Dict[Path, str] = {}
+        untracked: List[Path] = []
+        origin = BLOB_WORKTREE if self.git.rev is None else BLOB_COMMIT
+        for path in dict.fromkeys(paths):
+            blob = self.git.blob_for(path)
+            if blob is None:
+                if self.git.rev is not None:
+                    results[path] = on_error(path, FileNotFoundError(f"not in {self.git.rev}: {path}"))
+                else:
+                    untracked.append(path)
+                continue
+            digest = self.blob_digest(blob, algorithm, origin)
+            if digest is None:
+                unknown[path] = blob
+            else:
+                results[path] = digest
+                self.hits += 1
+        if unknown:
+            if self.git.rev is not None:
+                # As of a commit: hash the blobs themselves, never the checkout.
+                self.misses += len(unknown)
+                digests = self.git.hash_blobs(unknown.values(), algorithm)
+                for blob, digest in digests.items():
+                    self.store_blob(blob, algorithm, origin, digest)
+                for path, blob in unknown.items():
+                    if blob in digests:
+                        results[path] = digests[blob]
+                    else:
+                        results[path] = on_error(path, FileNotFoundError(f"missing git object {blob}"))
+            else:
+                # A clean file should be its blob, but it may have changed since
+                # the snapshot: only content whose own blob id matches names the blob.
+                verified = set()
+
+                def hash_clean(path: Path) -> str:
+                    digest, blob = hash_with_blob_id(path, algorithm)
+                    if blob == unknown[path]:
+                        verified.add(path)
+                    return digest
+
+                self.misses += len(unknown)
+                digests = map_files(hash_clean, unknown, workers, on_error)
+                for path in verified:
+                    self.store_blob(unknown[path], algorithm, origin, digests[path])
+                results.update(digests)
+        if untracked:
+            results.update(self._hash_stat(untracked, algorithm, workers, on_error))
+        return results
+
+    def _hash_stat(self, paths, algorithm, workers, on_error) -> Dict[Path, str]:
+        results: Dict[Path, str] = {}
+        pending: Dict[Path, Identity] = {}
+        for path in dict.fromkeys(paths):
+            try:
+                identity = file_identity(os.stat(path))
+            except OSError as e:
+                if isinstance(e, FileNotFoundError):
+                    self.evict(path)
+                results[path] = on_error(path, e)
+                continue
+            digest = self.lookup(path, algorithm, identity)
+            if digest is None:
+                pending[path] = identity
+            else:
+                results[path] = digest
+                self.hits += 1
+        self.misses += len(pending)
+        if pending:
+            started_ns = time.time_ns()
+            failed = set()
+
+            def record_error(path: Path, error: Exception) -> str:
+                failed.add(path)
+                return on_error(path, error)
+
+            hashed = hash_files(pending, algorithm, workers, record_error)
+            for path, digest in hashed.items():
+                if path not in failed:
+                    self.store(path, algorithm, pending[path], digest, started_ns)
+            results.update(hashed)
+        return results
+
+    def hash_file(self, path: Path, algorithm: str = DEFAULT_ALGORITHM) -> str:
+        """Cached digest of one file. Raises OSError like hashing.hash_file."""
+        errors: List[Exception] = []
+
+        def keep(path: Path, error: Exception) -> str:
+            errors.append(error)
+            return ""
+
+        digest = self.hash_files([path], algorithm, 1, keep)[path]
+        if errors:
+            raise errors[0]
+        return digest
+
+    def close(self) -> None:
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM hashes WHERE path = ? AND algorithm = ?", self._evicted
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO hashes (path, algorithm, size, mtime_ns, inode, digest)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(p, a, *identity, digest) for (p, a), (identity, digest) in self._upserts.items()],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO blobs (blob, algorithm, origin, digest) VALUES (?, ?, ?, ?)",
+                    [(b, a, o, digest) for (b, a, o), digest in self._new_blobs.items()],
+                )
+        finally:
+            self._conn.close()
@@ -2,11 +2,14 @@
 """Scan project structure and output key files for knowledge collection."""
 
 import argparse
-import hashlib
 import json
 import os
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from git_index import load_snapshot
+from hash_cache import HashCache
+from hashing import ALGORITHMS, DEFAULT_ALGORITHM, hash_files
 
 # Key files to look for (prioritized)
 KEY_FILES = [
@@ -31,22 +34,12 @@ SCAN_PATTERNS = {
 
 # Ignore patterns
 IGNORE_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv",
-               "dist", "build", ".next", "target", ".kiri"}
-
-
-def compute_hash(file_path: Path) -> str:
-    """Compute SHA256 hash of file content."""
-    sha256 = hashlib.sha256()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                sha256.update(chunk)
-        return f"sha256:{sha256.hexdigest()}"
-    except Exception:
-        return ""
+               "dist", "build", ".next", "target", ".kiri", ".eld"}
 
 
-def scan_project(project_path: str) -> Dict:
+def scan_project(project_path: str, algorithm: str = DEFAULT_ALGORITHM,
+                 workers: Optional[int] = None,
+                 cache: Optional[HashCache] = None) -> Dict:
     """Scan project and return structured information."""
     root = Path(project_path).resolve()
 
@@ -63,25 +56,30 @@ def scan_project(project_path: str) -> Dict:
         }
     }
 
-    # Find key files
-    for key_file in KEY_FILES:
-        file_path = root / key_file
-        if file_path.exists():
-            info = {
-                "path": str(file_path.relative_to(root)),
-                "hash": compute_hash(file_path),
-                "size": file_path.stat().st_size,
-            }
-            result["key_files"].append(info)
-
-            # Categorize
-            if "package.json" in key_file or "Cargo.toml" in key_file:
-                result["categories"]["project-info"].append(info["path"])
-                result["categories"]["dependencies"].append(info["path"])
-            elif "config" in key_file.lower():
-                result["categories"]["config"].append(info["path"])
-            elif ".md" in key_file:
-                result["categories"]["documentation"].append(info["path"])
+    # Find key files, then hash them together in parallel
+    found = [(key_file, root / key_file) for key_file in KEY_FILES
+             if (root / key_file).exists()]
+    paths = [path for _, path in found]
+    if cache is not None:
+        hashes = cache.hash_files(paths, algorithm, workers)
+    else:
+        hashes = hash_files(paths, algorithm, workers)
+    for key_file, file_path in found:
+        info = {
+            "path": str(file_path.relative_to(root)),
+            "hash": hashes[file_path],
+            "size": file_path.stat().st_size,
+        }
+        result["key_files"].append(info)
+
+        # Categorize
+        if "package.json" in key_file or "Cargo.toml" in key_file:
+            result["categories"]["project-info"].append(info["path"])
+            result["categories"]["dependencies"].append(info["path"])
+        elif "config" in key_file.lower():
+            result["categories"]["config"].append(info["path"])
+        elif ".md" in key_file:
+            result["categories"]["documentation"].append(info["path"])
 
     # Scan directory structure (top 2 levels)
     for item in sorted(root.iterdir()):
@@ -107,9 +105,31 @@ def main():
     parser = argparse.ArgumentParser(description="Scan project for knowledge collection")
     parser.add_argument("project_path", help="Path to project root")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default=DEFAULT_ALGORITHM,
+                        help="Content hash algorithm (blake2b is faster without SHA CPU instructions)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Hashing threads (default: based on CPU count)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse digests of unchanged files from .eld/hash-cache.sqlite")
+    parser.add_argument("--git", action="store_true",
+                        help="Take digests of clean tracked files from the git index (implies --cache)")
     args = parser.parse_args()
 
-    result = scan_project(args.project_path)
+    project_root = Path(args.project_path).resolve()
+    snapshot = None
+    if args.git:
+        try:
+            snapshot = load_snapshot(project_root)
+        except ValueError as e:
+            parser.error(str(e))
+    cache = HashCache.open(project_root) if args.cache or args.git else None
+    if cache is not None:
+        cache.git = snapshot
+    try:
+        result = scan_project(args.project_path, args.algorithm, args.workers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
     if args.json:
         print(json.dumps(result, indent=2))
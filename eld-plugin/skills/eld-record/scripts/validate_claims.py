@@ -2,47 +2,157 @@
 """Validate claims against current file state using hash comparison."""
 
 import argparse
-import hashlib
 import json
+import os
 import re
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
 
+from file_watcher import create_watcher, iter_changes
+from git_index import GitSnapshot, load_snapshot
+from hash_cache import HashCache
+from hashing import DEFAULT_ALGORITHM, algorithm_of, hash_file, hash_files
 
-def compute_hash(file_path: Path) -> str:
-    """Compute SHA256 hash of file content."""
-    sha256 = hashlib.sha256()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                sha256.update(chunk)
-        return f"sha256:{sha256.hexdigest()}"
-    except FileNotFoundError:
+# File path references in claim text: a name with a known extension, or any
+# slash-separated path. One pass; at each position the extension form wins
+# unless the name continues (`b.json.bak`), and a sentence-ending dot is left out.
+FILE_REFERENCE_RE = re.compile(
+    r'[\w/.-]+\.(?:json|md|py|ts|js|toml|yaml|yml)(?![\w-]|\.\w)'
+    r'|[\w/.-]+/[\w.-]+'
+)
+
+# A source file as validation needs it: the path and the algorithm to hash it with.
+FileKey = Tuple[Path, str]
+
+# Claims may cite any project path (node_modules/, dist/ ...), so the file index
+# only leaves out git's and eld's own bookkeeping.
+INDEX_SKIP_DIRS = {".git", ".eld"}
+
+
+def hash_error(file_path: Path, error: Exception) -> str:
+    """The sentinel validate_claim expects for a file that could not be hashed."""
+    if isinstance(error, FileNotFoundError):
         return "MISSING"
+    return f"ERROR:{error}"
+
+
+def compute_hash(file_path: Path, algorithm: str = DEFAULT_ALGORITHM,
+                 cache: Optional[HashCache] = None) -> str:
+    """Compute the content hash of a file ("MISSING" or "ERROR:..." on failure)."""
+    try:
+        if cache is not None:
+            return cache.hash_file(file_path, algorithm)
+        return hash_file(file_path, algorithm)
     except Exception as e:
-        return f"ERROR:{e}"
+        return hash_error(file_path, e)
 
 
 def extract_file_references(claim_text: str) -> List[str]:
-    """Extract file path references from claim text."""
-    patterns = [
-        r'[\w/.-]+\.(?:json|md|py|ts|js|toml|yaml|yml)',
-        r'[\w/.-]+/[\w.-]+',
-    ]
+    """Extract file path references from claim text, in order of appearance."""
+    return list(dict.fromkeys(FILE_REFERENCE_RE.findall(claim_text)))
+
+
+def build_file_index(project_root: Path) -> Set[str]:
+    """Relative paths of every file and directory in the project, skipping INDEX_SKIP_DIRS."""
+    index: Set[str] = set()
+    for dirpath, dirnames, filenames in os.walk(project_root):
+        dirnames[:] = [d for d in dirnames if d not in INDEX_SKIP_DIRS]
+        rel = os.path.relpath(dirpath, project_root)
+        prefix = "" if rel == "." else rel.replace(os.sep, "/") + "/"
+        index.update(prefix + name for name in dirnames)
+        index.update(prefix + name for name in filenames)
+    return index
+
+
+def revision_snapshot(cache: Optional[HashCache]) -> Optional[GitSnapshot]:
+    """The commit tree claims are validated against with --as-of, if any."""
+    if cache is not None and cache.git is not None and cache.git.rev is not None:
+        return cache.git
+    return None
+
+
+def resolve_file_references(refs: List[str], project_root: Path,
+                            file_index: Optional[Set[str]] = None,
+                            revision: Optional[GitSnapshot] = None) -> List[str]:
+    """The references that name an existing project path.
+
+    With a `revision` (--as-of) a path exists if it is in that commit's
+    tree, whatever the working tree holds. Otherwise, with a `file_index`
+    each reference is a set lookup; without one it is checked on the
+    filesystem.
+    """
+    if revision is None and file_index is None:
+        return [ref for ref in refs if (project_root / ref).exists()]
+    matched = []
+    for ref in refs:
+        normalized = ref[2:] if ref.startswith("./") else ref
+        if revision is not None:
+            found = revision.has_path(normalized.rstrip("/"))
+        elif normalized.split("/", 1)[0] in INDEX_SKIP_DIRS:
+            found = (project_root / ref).exists()
+        else:
+            found = normalized.rstrip("/") in file_index
+        if found:
+            matched.append(ref)
+    return matched
+
+
+def claim_file_key(claim: Dict, project_root: Path) -> Optional[FileKey]:
+    """The file a claim's stored hash must be checked against, if it has one."""
+    provenance = claim.get("provenance", {})
+    stored_hash = provenance.get("file_hash")
+    source_file = provenance.get("source_file")
+    if stored_hash and source_file:
+        # Re-hash with the algorithm the stored digest was made with.
+        return project_root / source_file, algorithm_of(stored_hash)
+    return None
+
+
+def plan_validation(claims: List[Dict], project_root: Path) -> Dict[str, List[Path]]:
+    """Distinct source files cited by the claims, grouped by hash algorithm."""
+    plan: Dict[str, Dict[Path, None]] = {}
+    for claim in claims:
+        file_key = claim_file_key(claim, project_root)
+        if file_key is not None:
+            file_path, algorithm = file_key
+            plan.setdefault(algorithm, {})[file_path] = None
+    return {algorithm: list(paths) for algorithm, paths in plan.items()}
 
-    files = []
-    for pattern in patterns:
-        matches = re.findall(pattern, claim_text)
-        files.extend(matches)
 
-    return list(set(files))
+def hash_planned_files(plan: Dict[str, List[Path]], workers: Optional[int] = None,
+                       cache: Optional[HashCache] = None,
+                       hashes: Optional[Dict[FileKey, str]] = None) -> Dict[FileKey, str]:
+    """Hash every planned file once, in parallel.
 
+    Files already in `hashes` are skipped and new digests are added to it.
+    """
+    if hashes is None:
+        hashes = {}
+    for algorithm, paths in plan.items():
+        paths = [path for path in paths if (path, algorithm) not in hashes]
+        if cache is not None:
+            digests = cache.hash_files(paths, algorithm, workers, hash_error)
+        else:
+            digests = hash_files(paths, algorithm, workers, hash_error)
+        for file_path, digest in digests.items():
+            hashes[(file_path, algorithm)] = digest
+    return hashes
 
-def validate_claim(claim: Dict, project_root: Path) -> Tuple[str, str]:
+
+def validate_claim(claim: Dict, project_root: Path,
+                   cache: Optional[HashCache] = None,
+                   hashes: Optional[Dict[FileKey, str]] = None,
+                   file_index: Optional[Set[str]] = None) -> Tuple[str, str]:
     """
     Validate a single claim.
 
+    `hashes` (from hash_planned_files) supplies current digests; files not in
+    it are hashed on demand. `file_index` (from build_file_index) resolves
+    file references in claims without a stored hash, except with --as-of,
+    where the revision's tree in `cache` resolves them.
+
     Returns:
         Tuple of (status, reason)
         status: VALID | OUTDATED | MISSING | UNVERIFIABLE
@@ -53,10 +163,13 @@ def validate_claim(claim: Dict, project_root: Path) -> Tuple[str, str]:
     # Check if provenance contains file hash
     stored_hash = provenance.get("file_hash")
     source_file = provenance.get("source_file")
+    file_key = claim_file_key(claim, project_root)
 
-    if stored_hash and source_file:
-        file_path = project_root / source_file
-        current_hash = compute_hash(file_path)
+    if file_key is not None:
+        if hashes is not None and file_key in hashes:
+            current_hash = hashes[file_key]
+        else:
+            current_hash = compute_hash(*file_key, cache)
 
         if current_hash == "MISSING":
             return "MISSING", f"File not found: {source_file}"
@@ -72,28 +185,103 @@ def validate_claim(claim: Dict, project_root: Path) -> Tuple[str, str]:
     if not file_refs:
         return "UNVERIFIABLE", "No file references found in claim"
 
-    # Check if any referenced files exist and have changed
-    for ref in file_refs:
-        file_path = project_root / ref
-        if file_path.exists():
-            # File exists but we don't have stored hash to compare
-            return "UNVERIFIABLE", f"File exists ({ref}) but no stored hash for comparison"
+    # Check which referenced files exist
+    matched = resolve_file_references(file_refs, project_root, file_index, revision_snapshot(cache))
+    if matched:
+        # Files exist but we don't have a stored hash to compare
+        noun = "File exists" if len(matched) == 1 else "Files exist"
+        return "UNVERIFIABLE", f"{noun} ({', '.join(matched)}) but no stored hash for comparison"
 
     return "UNVERIFIABLE", "Cannot verify claim without stored file hash"
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Validate claims")
-    parser.add_argument("project_path", help="Path to project root")
-    parser.add_argument("--claims", help="JSON file with claims to validate")
-    parser.add_argument("--json", action="store_true", help="Output as JSON")
-    args = parser.parse_args()
+def result_record(claim: Dict, reason: str) -> Dict:
+    return {
+        "claim_id": claim.get("id", "unknown"),
+        "text": claim.get("text", "")[:100] + "...",
+        "reason": reason,
+    }
 
-    project_root = Path(args.project_path).resolve()
 
-    # Read claims from file or stdin
-    if args.claims:
-        with open(args.claims) as f:
+def json_type(value: object) -> str:
+    """The JSON name of a decoded value's type, for error messages."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "array" if isinstance(value, list) else "object"
+
+
+def iter_jsonl_claims(stream: TextIO) -> Iterator[Dict]:
+    """Claims from a JSONL stream, one object (or {"claim": {...}}) per line.
+
+    Lines that are not JSON, or decode to something other than an object,
+    are reported on stderr with their line number and skipped.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            claim = json.loads(line)
+        except ValueError as e:
+            print(f"line {line_number}: skipped, invalid JSON ({e})", file=sys.stderr)
+            continue
+        if isinstance(claim, dict):
+            claim = claim.get("claim", claim)
+        if not isinstance(claim, dict):
+            print(f"line {line_number}: skipped, invalid record (expected a JSON object, got {json_type(claim)})",
+                  file=sys.stderr)
+            continue
+        yield claim
+
+
+def iter_batches(claims: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for claim in claims:
+        batch.append(claim)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_jsonl(claims: Iterable[Dict], out: TextIO, project_root: Path,
+                   batch_size: int = 1000, workers: Optional[int] = None,
+                   cache: Optional[HashCache] = None) -> Dict[str, int]:
+    """Validate claims in bounded batches, writing one result record per line as each batch completes.
+
+    Memory stays bounded by the batch size: only the digests of the distinct
+    source files seen so far and the project file index are kept across batches.
+    """
+    hashes: Dict[FileKey, str] = {}
+    file_index: Optional[Set[str]] = None
+    # With --as-of the revision's tree resolves references; the working tree is not walked.
+    needs_index = revision_snapshot(cache) is None
+    counts = {"claims": 0, "checked": 0}
+    for batch in iter_batches(claims, batch_size):
+        hash_planned_files(plan_validation(batch, project_root), workers, cache, hashes)
+        if needs_index and file_index is None and any(claim_file_key(c, project_root) is None for c in batch):
+            file_index = build_file_index(project_root)
+        for claim in batch:
+            status, reason = validate_claim(claim, project_root, cache, hashes, file_index)
+            record = {"status": status, **result_record(claim, reason)}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        counts["claims"] += len(batch)
+        counts["checked"] += sum(1 for c in batch if claim_file_key(c, project_root) is not None)
+    counts["files"] = len(hashes)
+    return counts
+
+
+def load_claims(claims_path: Optional[str]) -> List[Dict]:
+    """Claims from a JSON file (or stdin): a list, or a dict with a "claims" key."""
+    if claims_path:
+        with open(claims_path) as f:
             claims = json.load(f)
     else:
         print("Reading claims from stdin (paste JSON, then Ctrl+D)...")
@@ -103,6 +291,139 @@ def main():
     if isinstance(claims, dict) and "claims" in claims:
         claims = claims["claims"]
 
+    return [claim.get("claim", claim) for claim in claims]
+
+
+def watch_claims(claims: List[Dict], out: TextIO, project_root: Path,
+                 workers: Optional[int] = None, cache: Optional[HashCache] = None,
+                 debounce: float = 0.5, polling: bool = False, poll_interval: float = 1.0) -> None:
+    """Re-validate claims whose source files change, writing status transitions as JSONL.
+
+    The claim -> source file index is built once; each debounced batch of
+    changed files re-hashes only those files and re-validates only the claims
+    that cite them. Runs until interrupted.
+    """
+    watched = [claim for claim in claims if claim_file_key(claim, project_root) is not None]
+    by_file: Dict[Path, List[int]] = {}
+    for i, claim in enumerate(watched):
+        by_file.setdefault(claim_file_key(claim, project_root)[0], []).append(i)
+
+    hashes = hash_planned_files(plan_validation(watched, project_root), workers, cache)
+    statuses = [validate_claim(claim, project_root, cache, hashes)[0] for claim in watched]
+    counts = {status: statuses.count(status) for status in sorted(set(statuses))}
+    summary = ", ".join(f"{n} {status}" for status, n in counts.items())
+    print(f"Watching {len(by_file)} files for {len(watched)} claims ({summary or 'none'})", file=sys.stderr)
+
+    watcher = create_watcher(by_file, poll_interval, polling)
+    try:
+        for batch_number, changed in enumerate(iter_changes(watcher, debounce), 1):
+            affected = [i for path in changed for i in by_file.get(path, ())]
+            batch = [watched[i] for i in affected]
+            hashes = hash_planned_files(plan_validation(batch, project_root), workers, cache)
+            timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            for i in affected:
+                status, reason = validate_claim(watched[i], project_root, cache, hashes)
+                if status == statuses[i]:
+                    continue
+                out.write(json.dumps({
+                    "event": "transition",
+                    "batch": batch_number,
+                    "timestamp": timestamp,
+                    "claim_id": watched[i].get("id", "unknown"),
+                    "source_file": watched[i]["provenance"]["source_file"],
+                    "from": statuses[i],
+                    "to": status,
+                    "reason": reason,
+                }, ensure_ascii=False) + "\n")
+                statuses[i] = status
+            out.flush()
+    finally:
+        watcher.close()
+
+
+def open_cache(parser: argparse.ArgumentParser, args: argparse.Namespace,
+               project_root: Path) -> Optional[HashCache]:
+    """The hash cache the options ask for; --git and --as-of keep blob digests in it."""
+    if not (args.cache or args.git or args.as_of):
+        return None
+    snapshot = None
+    if args.git or args.as_of:
+        try:
+            snapshot = load_snapshot(project_root, args.as_of)
+        except ValueError as e:
+            parser.error(str(e))
+    cache = HashCache.open(project_root)
+    cache.git = snapshot
+    return cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate claims")
+    parser.add_argument("project_path", help="Path to project root")
+    parser.add_argument("--claims", help="JSON file with claims to validate")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse digests of unchanged files from .eld/hash-cache.sqlite")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Hashing threads (default: based on CPU count)")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="Read one claim per line and write one result per line, streaming")
+    parser.add_argument("--batch", type=int, default=1000,
+                        help="Claims validated per batch in --jsonl mode")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and emit JSONL events when claims change status")
+    parser.add_argument("--debounce", type=float, default=0.5,
+                        help="Seconds without changes before a batch is re-validated in --watch mode")
+    parser.add_argument("--poll", type=float, default=None, metavar="SECONDS",
+                        help="Poll file stats at this interval instead of using inotify in --watch mode")
+    parser.add_argument("--git", action="store_true",
+                        help="Take digests of clean tracked files from the git index (implies --cache)")
+    parser.add_argument("--as-of", metavar="REV",
+                        help="Validate against the files in git revision REV, not the working tree")
+    args = parser.parse_args()
+    if args.watch and (args.git or args.as_of):
+        parser.error("--watch cannot be combined with --git or --as-of")
+
+    project_root = Path(args.project_path).resolve()
+
+    if args.watch:
+        if args.jsonl:
+            stream = open(args.claims) if args.claims else sys.stdin
+            with stream:
+                claims = list(iter_jsonl_claims(stream))
+        else:
+            claims = load_claims(args.claims)
+        cache = open_cache(parser, args, project_root)
+        try:
+            watch_claims(claims, sys.stdout, project_root, args.workers, cache, args.debounce,
+                         polling=args.poll is not None, poll_interval=args.poll or 1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if cache is not None:
+                cache.close()
+        return
+
+    if args.jsonl:
+        cache = open_cache(parser, args, project_root)
+        stream = open(args.claims) if args.claims else sys.stdin
+        try:
+            counts = validate_jsonl(iter_jsonl_claims(stream), sys.stdout, project_root,
+                                    max(1, args.batch), args.workers, cache)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if cache is not None:
+                cache.close()
+        stats = (f"Checked {counts['files']} distinct files for {counts['checked']} hash-checked claims"
+                 f" ({counts['claims']} claims total)")
+        if cache is not None:
+            stats += f", {cache.hits} digests reused from cache"
+        print(stats, file=sys.stderr)
+        return
+
+    claims = load_claims(args.claims)
+
     results = {
         "VALID": [],
         "OUTDATED": [],
@@ -110,19 +431,32 @@ def main():
         "UNVERIFIABLE": [],
     }
 
-    for claim in claims:
-        claim_data = claim.get("claim", claim)
-        claim_id = claim_data.get("id", "unknown")
-        status, reason = validate_claim(claim_data, project_root)
+    # Hash each distinct source file once, then resolve every claim against the map
+    plan = plan_validation(claims, project_root)
+    cache = open_cache(parser, args, project_root)
+    # Index the project once if any claim needs its text references resolved
+    # (with --as-of the revision's tree resolves them instead)
+    needs_index = (revision_snapshot(cache) is None
+                   and any(claim_file_key(claim, project_root) is None for claim in claims))
+    file_index = build_file_index(project_root) if needs_index else None
+    try:
+        hashes = hash_planned_files(plan, args.workers, cache)
+        for claim_data in claims:
+            status, reason = validate_claim(claim_data, project_root, cache, hashes, file_index)
+            results[status].append(result_record(claim_data, reason))
+    finally:
+        if cache is not None:
+            cache.close()
 
-        results[status].append({
-            "claim_id": claim_id,
-            "text": claim_data.get("text", "")[:100] + "...",
-            "reason": reason,
-        })
+    checked = sum(1 for claim in claims if claim_file_key(claim, project_root) is not None)
+    stats = f"Checked {len(hashes)} distinct files for {checked} hash-checked claims ({len(claims)} claims total)"
+    if cache is not None:
+        stats += f", {cache.hits} digests reused from cache"
 
     if args.json:
         print(json.dumps(results, indent=2))
+        # Keep stdout the same JSON document; the stats go to stderr
+        print(stats, file=sys.stderr)
     else:
         print(f"Validation Results for {project_root}\n")
         print("=" * 60)
@@ -137,6 +471,7 @@ def main():
         total = sum(len(v) for v in results.values())
         valid = len(results["VALID"])
         print(f"Summary: {valid}/{total} claims validated")
+        print(stats)
 
         # Suggest feedback
         if results["OUTDATED"]:
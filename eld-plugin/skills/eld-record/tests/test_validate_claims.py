@@ -0,0 +1,141 @@
+"""Claim file-reference resolution, on the working tree and --as-of a revision."""
+import io
+import shutil
+import subprocess
+
+import pytest
+
+from git_index import load_snapshot
+from hash_cache import BLOB_COMMIT, BLOB_WORKTREE, HashCache
+from hashing import DEFAULT_ALGORITHM, hash_file
+from validate_claims import (
+    build_file_index,
+    extract_file_references,
+    iter_jsonl_claims,
+    resolve_file_references,
+    validate_claim,
+)
+
+needs_git = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def git(root, *args):
+    subprocess.run(["git", "-C", str(root), *args], check=True, capture_output=True)
+
+
+@pytest.fixture
+def project(tmp_path):
+    write(tmp_path / "src" / "app.py", "app\n")
+    write(tmp_path / "docs" / "guide.md", "guide\n")
+    write(tmp_path / "node_modules" / "pkg" / "index.js", "pkg\n")
+    write(tmp_path / ".eld" / "notes.md", "notes\n")
+    return tmp_path
+
+
+@pytest.fixture
+def history(tmp_path):
+    """A repo where src/old.py was deleted and src/new.py added after the first commit."""
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "eld@example.com")
+    git(tmp_path, "config", "user.name", "eld")
+    write(tmp_path / "src" / "old.py", "old\n")
+    write(tmp_path / "src" / "keep.py", "v1\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "one")
+    (tmp_path / "src" / "old.py").unlink()
+    write(tmp_path / "src" / "new.py", "new\n")
+    write(tmp_path / "src" / "keep.py", "v2\n")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "two")
+    return tmp_path
+
+
+def test_extract_file_references_in_order_without_duplicates():
+    text = "See config/app.json. Then README.md, b.json.bak and src/lib/x; config/app.json again."
+    assert extract_file_references(text) == ["config/app.json", "README.md", "src/lib/x"]
+
+
+def test_index_resolution_matches_the_filesystem(project):
+    refs = ["src/app.py", "./docs/guide.md", "docs/", "src", "node_modules/pkg/index.js",
+            ".eld/notes.md", "src/missing.py", ".git/HEAD"]
+    index = build_file_index(project)
+    assert resolve_file_references(refs, project, index) == resolve_file_references(refs, project)
+    assert resolve_file_references(refs, project, index) == [
+        "src/app.py", "./docs/guide.md", "docs/", "src", "node_modules/pkg/index.js", ".eld/notes.md",
+    ]
+
+
+def test_claim_reports_every_matched_file(project):
+    claim = {"id": "c", "text": "src/app.py and docs/guide.md, not src/gone.py"}
+    status, reason = validate_claim(claim, project, file_index=build_file_index(project))
+    assert status == "UNVERIFIABLE"
+    assert reason == "Files exist (src/app.py, docs/guide.md) but no stored hash for comparison"
+
+
+@needs_git
+def test_as_of_resolves_references_from_the_revision_tree(history):
+    cache = HashCache.open(history)
+    cache.git = load_snapshot(history, "HEAD~1")
+    try:
+        refs = ["src/old.py", "src/new.py", "src/keep.py", "src"]
+        assert resolve_file_references(refs, history, revision=cache.git) == ["src/old.py", "src/keep.py", "src"]
+        claim = {"id": "c", "text": "see src/new.py"}
+        # A file added later is not there as of HEAD~1, even though the working tree has it.
+        assert validate_claim(claim, history, cache) == (
+            "UNVERIFIABLE", "Cannot verify claim without stored file hash")
+    finally:
+        cache.close()
+
+
+@needs_git
+def test_as_of_hashes_committed_content(history):
+    stored = hash_file(history / "src" / "keep.py")
+    claim = {"id": "c", "text": "x", "provenance": {"source_file": "src/keep.py", "file_hash": stored}}
+    cache = HashCache.open(history)
+    cache.git = load_snapshot(history, "HEAD~1")
+    try:
+        assert validate_claim(claim, history, cache)[0] == "OUTDATED"
+        deleted = {"id": "d", "text": "x", "provenance": {"source_file": "src/new.py", "file_hash": stored}}
+        assert validate_claim(deleted, history, cache)[0] == "MISSING"
+    finally:
+        cache.close()
+
+
+@needs_git
+def test_worktree_and_commit_blob_digests_are_kept_apart(history):
+    path = history / "src" / "keep.py"
+    blob = load_snapshot(history, "HEAD").blob_for(path)
+    cache = HashCache.open(history)
+    cache.git = load_snapshot(history)
+    try:
+        digest = cache.hash_file(path)
+    finally:
+        cache.close()
+    cache = HashCache.open(history)
+    cache.git = load_snapshot(history, "HEAD")
+    try:
+        # A digest read from the checkout does not answer for the committed object.
+        assert cache.blob_digest(blob, DEFAULT_ALGORITHM, BLOB_WORKTREE) == digest
+        assert cache.blob_digest(blob, DEFAULT_ALGORITHM, BLOB_COMMIT) is None
+        assert cache.hash_file(path) == digest
+        assert cache.hits == 0
+    finally:
+        cache.close()
+    cache = HashCache.open(history)
+    try:
+        assert cache.blob_digest(blob, DEFAULT_ALGORITHM, BLOB_COMMIT) == digest
+    finally:
+        cache.close()
+
+
+def test_jsonl_reports_records_that_are_not_objects(capsys):
+    stream = io.StringIO('{"id": "a"}\n[1, 2]\n"text"\n7\n{"claim": null}\nnot json\n{"claim": {"id": "b"}}\n')
+    assert [claim["id"] for claim in iter_jsonl_claims(stream)] == ["a", "b"]
+    errors = capsys.readouterr().err.splitlines()
+    assert [line.split(":", 1)[0] for line in errors] == ["line 2", "line 3", "line 4", "line 5", "line 6"]
+    assert "got array" in errors[0] and "invalid JSON" in errors[4]
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the Relational Design hook scripts.
+
+`replay` drives whole hook calls: it replays a recorded `hook-events.jsonl`
+(or a synthetic one) through trace-hook.py into a scratch project, either
+as one subprocess per call (what Claude Code does) or in-process, with a
+configurable number of concurrent callers standing in for parallel
+subagents.
+
+`stress` has many processes append large records to one rotating event
+log at once and checks that every line comes back whole and exactly once.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+SCRIPTS = Path(__file__).resolve().parent
+
+SAMPLE_PATHS = [
+    "src/app/pricing/page.tsx",
+    "src/components/Button.vue",
+    "src/lib/api/client.ts",
+    "packages/design-system/tokens/color.json",
+    "src/styles/global.scss",
+    "docs/README.md",
+    "src/stories/Button.stories.ts",
+    "server/handlers/users.py",
+    "C:\\repo\\src\\theme\\index.ts",
+    "",
+]
+
+
+def load_hook() -> Any:
+    """The hook handlers trace-hook.py runs in-process."""
+    sys.path.insert(0, str(SCRIPTS))
+    import trace_handlers
+
+    return trace_handlers
+
+
+def legacy_classifier(hook: Any) -> Callable[[str], bool]:
+    """The pre-classifier implementation, kept as the benchmark baseline."""
+
+    def is_design_file(path: str) -> bool:
+        if not path:
+            return False
+        normalized = path.replace("\\", "/")
+        suffix = Path(normalized).suffix.lower()
+        if suffix in hook.DESIGN_EXTENSIONS:
+            return True
+        return any(re.search(pattern, normalized) for pattern in hook.DESIGN_PATH_PATTERNS)
+
+    return is_design_file
+
+
+def per_call_ns(fn: Callable[[str], Any], paths: List[str], iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        for path in paths:
+            fn(path)
+    return (time.perf_counter_ns() - start) / (iterations * len(paths))
+
+
+def bench_classifier(args: argparse.Namespace) -> int:
+    hook = load_hook()
+    legacy = legacy_classifier(hook)
+    globs = tuple(args.glob)
+    classifier = hook.DesignFileClassifier(globs)
+    # Distinct paths defeat the memo cache and measure the uncached path.
+    unique = [f"v{i}/{p}" if p else p for i in range(args.iterations) for p in SAMPLE_PATHS]
+
+    for path in SAMPLE_PATHS:
+        if not globs and legacy(path) != classifier.classify(path):
+            print(f"mismatch: {path!r}", file=sys.stderr)
+            return 1
+
+    rows = [
+        ("legacy (Path + re.search per pattern)", per_call_ns(legacy, SAMPLE_PATHS, args.iterations)),
+        ("classifier, uncached", per_call_ns(classifier._classify, unique, 1)),
+        ("classifier, memoized", per_call_ns(classifier.classify, SAMPLE_PATHS, args.iterations)),
+    ]
+    print(f"is_design_file: {len(SAMPLE_PATHS)} paths x {args.iterations} iterations, {len(globs)} extra glob(s)")
+    for label, ns in rows:
+        print(f"  {label:<40} {ns:10.1f} ns/call")
+    return 0
+
+
+def write_payload(size: int, trace_id_at: str) -> bytes:
+    """A Write PreToolUse payload whose `content` is about `size` bytes of TSX-like source."""
+    line = '  <Button variant="primary" onClick={() => track("cta \\"hero\\"")}>{t("pricing.cta")}</Button>\n'
+    body = line * max(1, size // len(line))
+    if trace_id_at == "start":
+        body = "// RD-DD-014\n" + body
+    elif trace_id_at == "end":
+        body += "// RD-DD-014\n"
+    return json.dumps({
+        "session_id": "bench",
+        "cwd": "/repo",
+        "hook_event_name": "PreToolUse",
+        "tool_name": "Write",
+        "tool_input": {"file_path": "src/app/pricing/page.tsx", "content": body},
+    }).encode("utf-8")
+
+
+def legacy_decode(hook: Any, raw: bytes) -> bool:
+    """The pre-fast-path decode: whole payload to str, full json.loads, regex over the content."""
+    event = json.loads(raw.decode("utf-8", errors="replace"))
+    content = (event.get("tool_input") or {}).get("content")
+    return bool(isinstance(content, str) and hook.TRACE_ID_RE.search(content))
+
+
+def fast_decode(hook: Any, raw: bytes) -> bool:
+    return hook.contains_trace_id(hook.parse_input(raw))
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> tuple:
+    """(best ms per call, peak traced MiB of one call, result)."""
+    best = float("inf")
+    result = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000, peak / (1024 * 1024), result
+
+
+def bench_decode(args: argparse.Namespace) -> int:
+    hook = load_hook()
+    size = int(args.size_mb * 1024 * 1024)
+    print(f"hook stdin decode: {args.size_mb:g} MB Write payload, best of {args.iterations}")
+    for where in ("none", "start", "end"):
+        raw = write_payload(size, where)
+        rows = [
+            ("legacy (decode + json.loads + re)", measure(lambda: legacy_decode(hook, raw), args.iterations)),
+            ("fast path (elide + bytes re)", measure(lambda: fast_decode(hook, raw), args.iterations)),
+        ]
+        if rows[0][1][2] != rows[1][1][2]:
+            print(f"mismatch for trace id at {where}", file=sys.stderr)
+            return 1
+        print(f"  trace id: {where} (found: {rows[1][1][2]})")
+        for label, (ms, peak, _) in rows:
+            print(f"    {label:<36} {ms:9.1f} ms  peak {peak:7.1f} MiB")
+    return 0
+
+
+PHASE_EVENT_NAMES = {
+    "session-start": "SessionStart",
+    "pre-tool-use": "PreToolUse",
+    "post-tool-use": "PostToolUse",
+    "subagent-stop": "SubagentStop",
+    "stop": "Stop",
+}
+SYNTHETIC_PATHS = SAMPLE_PATHS[:-2] + [".relational-design/current-session.yaml"]
+SYNTHETIC_AGENTS = ["relational-design-plugin:design-critic", "relational-design-plugin:relation-mapper"]
+
+
+def recorded_calls(path: Path, cwd: str) -> List[Tuple[str, bytes]]:
+    """Hook payloads rebuilt from the metadata a recorded event log keeps."""
+    calls = []
+    with path.open("rb") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            phase = item.get("phase")
+            if phase not in PHASE_EVENT_NAMES:
+                continue
+            event: Dict[str, Any] = {
+                "session_id": item.get("session_id"),
+                "cwd": cwd,
+                "hook_event_name": PHASE_EVENT_NAMES[phase],
+            }
+            if item.get("tool_name"):
+                event["tool_name"] = item["tool_name"]
+                event["tool_input"] = {"file_path": item.get("file_path") or ""}
+                if item.get("has_inline_trace_id"):
+                    event["tool_input"]["new_string"] = "// RD-DD-001"
+            if item.get("agent_type"):
+                event["agent_type"] = item["agent_type"]
+            calls.append((phase, json.dumps(event).encode("utf-8")))
+    return calls
+
+
+def synthetic_calls(count: int, sessions: int, cwd: str, seed: int) -> List[Tuple[str, bytes]]:
+    """Sessions of Edit pre/post pairs, with subagent stops and a Stop every 20 calls."""
+    rng = random.Random(seed)
+    calls: List[Tuple[str, bytes]] = []
+    for i in range(count):
+        session = f"bench-{i % sessions}"
+        base = {"session_id": session, "cwd": cwd}
+        if i < sessions:
+            phase, extra = "session-start", {}
+        elif i % 20 == 19:
+            phase, extra = "stop", {}
+        elif i % 7 == 6:
+            phase, extra = "subagent-stop", {"agent_type": rng.choice(SYNTHETIC_AGENTS)}
+        else:
+            phase = "pre-tool-use" if i % 2 else "post-tool-use"
+            path = rng.choice(SYNTHETIC_PATHS)
+            body = "const cta = 'Start trial'; // RD-DD-003\n" if rng.random() < 0.3 else "const cta = 'Start trial';\n"
+            extra = {"tool_name": "Edit", "tool_input": {"file_path": path, "old_string": "x", "new_string": body}}
+        event = {**base, "hook_event_name": PHASE_EVENT_NAMES[phase], **extra}
+        calls.append((phase, json.dumps(event).encode("utf-8")))
+    return calls
+
+
+def subprocess_caller(project: Path) -> Callable[[str, bytes], None]:
+    hook_script = str(SCRIPTS / "trace-hook.py")
+    env = dict(os.environ)
+    # Point the client at a socket that does not exist so no running daemon is used.
+    env["RELATIONAL_DESIGN_HOOK_SOCKET"] = str(project / "no-daemon.sock")
+
+    def call(phase: str, raw: bytes) -> None:
+        subprocess.run(
+            [sys.executable, hook_script, phase],
+            input=raw, cwd=project, env=env, stdout=subprocess.DEVNULL, check=False,
+        )
+
+    return call
+
+
+def inprocess_caller(project: Path) -> Callable[[str, bytes], None]:
+    hook = load_hook()
+
+    def call(phase: str, raw: bytes) -> None:
+        hook.run_hook(phase, raw, str(project), hook.StageTimer(), lambda reply: None)
+
+    return call
+
+
+def log_sizes(project: Path) -> Dict[str, int]:
+    sizes: Dict[str, int] = defaultdict(int)
+    directory = project / ".relational-design" / "events"
+    if not directory.exists():
+        return sizes
+    for path in directory.iterdir():
+        if path.name.startswith("hook-events.") and path.name.endswith((".jsonl.gz", ".jsonl.zst", ".jsonl")) and path.name != "hook-events.jsonl":
+            sizes["sealed segments"] += path.stat().st_size
+            sizes["sealed segment count"] += 1
+        elif path.is_file():
+            sizes[path.name] += path.stat().st_size
+    return sizes
+
+
+def bench_replay(args: argparse.Namespace) -> int:
+    project = Path(tempfile.mkdtemp(prefix="rd-replay-"))
+    try:
+        if args.settings:
+            (project / ".claude").mkdir()
+            shutil.copy(args.settings, project / ".claude" / "relational-design-plugin.local.md")
+        if args.events:
+            calls = recorded_calls(Path(args.events), str(project))
+        else:
+            calls = synthetic_calls(args.count, args.sessions, str(project), args.seed)
+        if args.limit:
+            calls = calls[:args.limit]
+        if args.with_session:
+            (project / ".relational-design").mkdir(exist_ok=True)
+            shutil.copy(SCRIPTS.parent / "templates" / "trace-session.yaml", project / ".relational-design" / "current-session.yaml")
+        call = subprocess_caller(project) if args.mode == "subprocess" else inprocess_caller(project)
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+
+        def timed(item: Tuple[str, bytes]) -> None:
+            phase, raw = item
+            start = time.perf_counter()
+            call(phase, raw)
+            latencies[phase].append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(timed, calls))
+        wall = time.perf_counter() - started
+
+        source = args.events or f"synthetic ({args.count} calls, {args.sessions} sessions)"
+        print(f"replay: {len(calls)} hook calls from {source}, mode {args.mode}, concurrency {args.concurrency}")
+        print(f"  wall clock: {wall:.2f} s, {len(calls) / wall:.1f} calls/s overall")
+        print(f"  {'phase':<15} {'calls':>7} {'calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for phase in PHASE_EVENT_NAMES:
+            values = sorted(latencies.get(phase, ()))
+            if not values:
+                continue
+            # Sustained rate if only this phase ran at the same concurrency.
+            rate = len(values) * args.concurrency / (sum(values) / 1000)
+            pct = [values[min(len(values) - 1, int(p / 100 * len(values)))] for p in (50, 95, 99)]
+            print(f"  {phase:<15} {len(values):>7} {rate:>9.1f} {pct[0]:>8.2f} {pct[1]:>8.2f} {pct[2]:>8.2f} {values[-1]:>8.2f}")
+        print("  log sizes:")
+        for name, size in sorted(log_sizes(project).items()):
+            print(f"    {name:<28} {size:>12,}")
+        if args.keep:
+            print(f"  kept scratch project at {project}")
+        return 0
+    finally:
+        if not args.keep:
+            shutil.rmtree(project, ignore_errors=True)
+
+
+def stress_writer(job: Tuple[str, int, int, int, Dict[str, Any], float]) -> None:
+    root, writer, records, record_bytes, settings, start_at = job
+    sys.path.insert(0, str(SCRIPTS))
+    from trace_store import write_records
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    for seq in range(records):
+        head = {"writer": writer, "seq": seq, "pad": ""}
+        pad = max(0, record_bytes - len(json.dumps(head)) - 1)
+        line = json.dumps({**head, "pad": chr(ord("a") + writer % 26) * pad}) + "\n"
+        write_records(Path(root), [line.encode("ascii")], settings)
+
+
+def verify_log(root: Path, writers: int, records: int) -> Dict[str, int]:
+    sys.path.insert(0, str(SCRIPTS))
+    from trace_segments import iter_lines
+    from trace_store import events_dir
+
+    seen = set()
+    counts = {"lines": 0, "torn": 0, "duplicates": 0}
+    for line in iter_lines(events_dir(root)):
+        counts["lines"] += 1
+        try:
+            item = json.loads(line)
+            key = (item["writer"], item["seq"])
+            pad = item["pad"]
+        except (ValueError, KeyError, TypeError):
+            counts["torn"] += 1
+            continue
+        if pad.strip(chr(ord("a") + key[0] % 26)):
+            counts["torn"] += 1
+        elif key in seen:
+            counts["duplicates"] += 1
+        else:
+            seen.add(key)
+    counts["missing"] = writers * records - len(seen)
+    return counts
+
+
+def bench_stress(args: argparse.Namespace) -> int:
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    total = args.writers * args.records
+    print(
+        f"stress: {args.writers} writer processes x {args.records} records of {args.record_bytes} bytes,"
+        f" segment limit {args.segment_bytes} bytes, compression {args.compression}"
+    )
+    root = Path(tempfile.mkdtemp(prefix="rd-stress-")) / ".relational-design"
+    settings = {
+        "event_segment_max_bytes": args.segment_bytes,
+        "event_segment_max_age_hours": 0,
+        "event_segment_compression": args.compression,
+    }
+    try:
+        start_at = time.time() + 0.5
+        jobs = [(str(root), w, args.records, args.record_bytes, settings, start_at) for w in range(args.writers)]
+        with context.Pool(args.writers) as pool:
+            pool.map(stress_writer, jobs)
+        wall = time.time() - start_at
+        counts = verify_log(root, args.writers, args.records)
+    finally:
+        shutil.rmtree(root.parent, ignore_errors=True)
+    ok = counts["torn"] == counts["duplicates"] == counts["missing"] == 0
+    mb = total * args.record_bytes / (1024 * 1024)
+    print(
+        f"  {wall:6.2f} s  {total / wall:9.1f} records/s  {mb / wall:7.1f} MiB/s"
+        f"  lines {counts['lines']}, torn {counts['torn']}, duplicates {counts['duplicates']},"
+        f" missing {counts['missing']}  {'ok' if ok else 'FAILED'}"
+    )
+    return 0 if ok else 1
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="bench", required=True)
+    classifier = sub.add_parser("classifier", help="per-call cost of is_design_file")
+    classifier.add_argument("--iterations", type=int, default=20000)
+    classifier.add_argument("--glob", action="append", default=[], help="extra design glob (repeatable)")
+    classifier.set_defaults(func=bench_classifier)
+    decode = sub.add_parser("decode", help="hook stdin decode of a large Write payload")
+    decode.add_argument("--size-mb", type=float, default=10.0)
+    decode.add_argument("--iterations", type=int, default=5)
+    decode.set_defaults(func=bench_decode)
+    replay = sub.add_parser("replay", help="replay recorded or synthetic hook calls through trace-hook.py")
+    replay.add_argument("--events", help="recorded hook-events.jsonl to replay (default: synthetic)")
+    replay.add_argument("--count", type=int, default=2000, help="synthetic calls")
+    replay.add_argument("--sessions", type=int, default=8, help="synthetic sessions")
+    replay.add_argument("--seed", type=int, default=0)
+    replay.add_argument("--limit", type=int, default=0, help="replay at most this many calls")
+    replay.add_argument("--mode", choices=["subprocess", "inprocess"], default="inprocess")
+    replay.add_argument("--concurrency", type=int, default=1, help="concurrent callers (parallel subagents)")
+    replay.add_argument("--settings", help="plugin settings file to use in the scratch project")
+    replay.add_argument("--with-session", action="store_true", help="start with current-session.yaml in place")
+    replay.add_argument("--keep", action="store_true", help="keep the scratch project")
+    replay.set_defaults(func=bench_replay)
+    stress = sub.add_parser("stress", help="concurrent appends: verify every record comes back whole and once")
+    stress.add_argument("--writers", type=int, default=16)
+    stress.add_argument("--records", type=int, default=200, help="records per writer")
+    stress.add_argument("--record-bytes", type=int, default=64 * 1024, help="bytes per record (PIPE_BUF is 4096)")
+    stress.add_argument("--segment-bytes", type=int, default=16 * 1024 * 1024, help="rotation threshold; 0 disables")
+    stress.add_argument("--compression", choices=["gzip", "zstd", "none"], default="none")
+    stress.set_defaults(func=bench_stress)
+    args = p.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
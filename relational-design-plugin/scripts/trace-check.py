@@ -3,46 +3,203 @@
 from __future__ import annotations
 
 import argparse
-import re
-from collections import Counter
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from dataclasses import asdict
+from typing import Any, Dict, List, Set
 
-ID_RE = re.compile(r"RD-(?:O|A|C|R|H|DD|AR|CR|RV|RT|BF)-\d+", re.I)
-ID_DEF_RE = re.compile(r"^\s*-?\s*id:\s*(RD-(?:O|A|C|R|H|DD|AR|CR|RV|RT|BF)-\d+)\s*$", re.I | re.M)
-REQUIRED_SECTIONS = [
-    "observations",
-    "assumptions",
-    "constraints",
-    "relations",
-    "hypotheses",
-    "decisions",
-    "artifacts",
-    "critiques",
-]
+from trace_graph import (
+    DEPENDENCY_EDGES,
+    check_cache_path,
+    discover_sessions,
+    TraceGraph,
+    load_check_cache,
+    load_graph,
+    retraction_impact,
+    save_check_cache,
+    summarize_session,
+    validate_nodes,
+)
+
+WARNING_MESSAGES = {
+    "withdrawn-dependency": "depends on withdrawn node {ref} ({via})",
+    "missing-kind": "no kind field",
+    "missing-status": "no status field",
+}
+# Always printed, matching templates/retract-impact.md.
+IMPACT_SECTIONS = ["relations", "hypotheses", "decisions", "artifacts"]
+
+
+def print_impact(graph: TraceGraph, node_id: str, as_json: bool) -> int:
+    node = graph.nodes.get(node_id)
+    if node is None:
+        print(f"unknown node: {node_id}")
+        return 1
+    entries = retraction_impact(graph, node_id)
+    if as_json:
+        print(json.dumps({
+            "invalidated_node": {"id": node_id, "section": node.section, "claim": node.fields.get("claim")},
+            "affected": [asdict(e) for e in entries],
+        }, ensure_ascii=False, indent=2))
+        return 0
+    by_section: Dict[str, List[str]] = {s: [] for s in IMPACT_SECTIONS}
+    for e in entries:
+        by_section.setdefault(e.section or "undefined", []).append(
+            f"{e.id}  # depth {e.depth} from {e.parent} ({e.via})"
+        )
+    print("invalidated_node:")
+    print(f"  id: {node_id}")
+    print(f"  section: {node.section}")
+    for section, items in by_section.items():
+        if not items:
+            print(f"affected_{section}: []")
+            continue
+        print(f"affected_{section}:")
+        for item in items:
+            print(f"  - {item}")
+    return 0
+
+
+def check_all(root: Path, jobs: int) -> int:
+    """Check every session under `root` in parallel and resolve references across sessions.
+
+    A reference that is not defined in its own session but is defined in
+    exactly one other session is reported as a cross-session reference. It
+    fails the check only when no session defines it (dangling) or several
+    other sessions do (ambiguous). IDs defined in several sessions are listed
+    for information, since each session numbers its nodes from 001.
+    """
+    sessions = discover_sessions(root)
+    if not sessions:
+        print(f"missing: no sessions under {root}")
+        return 1
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        summaries: List[Dict[str, Any]] = list(pool.map(summarize_session, [str(p) for p in sessions]))
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    defined_in: Dict[str, List[str]] = defaultdict(list)
+    for summary in summaries:
+        for node_id in summary.get("defined", ()):
+            defined_in[node_id].append(summary["path"])
+
+    failed = False
+    cross_refs: List[str] = []
+    dangling: List[str] = []
+    ambiguous: List[str] = []
+    print(f"trace sessions: {len(summaries)} under {root}")
+    for summary in summaries:
+        path = summary["path"]
+        if "error" in summary:
+            failed = True
+            print(f"  - {path}: unreadable ({summary['error']})")
+            continue
+        local = [f"missing sections {', '.join(summary['missing_sections'])}"] if summary["missing_sections"] else []
+        local += [f"duplicate {i}" for i in summary["duplicates"]]
+        local += [f"cycle {' -> '.join(c)}" for c in summary["cycles"]]
+        failed = failed or bool(local)
+        print(f"  - {path}: {summary['nodes']} nodes, {summary['edges']} edges" + (f" [{'; '.join(local)}]" if local else ""))
+        for ref in summary["unresolved"]:
+            owners = [p for p in defined_in.get(ref["target"], ()) if p != path]
+            where = f"{path}: {ref['target']} (from {ref['source']}.{ref['kind']})"
+            if not owners:
+                dangling.append(where)
+            elif len(owners) > 1:
+                ambiguous.append(f"{where} defined in {', '.join(owners)}")
+            else:
+                cross_refs.append(f"{where} -> {owners[0]}")
+
+    shared = sorted(i for i, owners in defined_in.items() if len(owners) > 1)
+    for title, items in (
+        ("dangling references (defined in no session)", dangling),
+        ("ambiguous cross-session references", ambiguous),
+        ("cross-session references", cross_refs),
+    ):
+        if items:
+            print(f"{title}:")
+            for item in items:
+                print(f"  - {item}")
+    print(f"ids defined in more than one session: {len(shared)}" + (f" ({', '.join(shared[:20])}{', ...' if len(shared) > 20 else ''})" if shared else ""))
+
+    print("timing:")
+    print(f"  wall clock: {wall_ms:.1f} ms for {len(summaries)} session(s)")
+    for summary in sorted(summaries, key=lambda s: -(s["parse_ms"] + s["check_ms"])):
+        print(f"  - {summary['path']}: parse {summary['parse_ms']:.1f} ms, check {summary['check_ms']:.1f} ms")
+
+    failed = failed or bool(dangling) or bool(ambiguous)
+    return 2 if failed else 0
 
 
 def main() -> int:
     p = argparse.ArgumentParser()
     p.add_argument("--root", default=".relational-design")
     p.add_argument("--session", default="current-session.yaml")
+    p.add_argument("--reachable", metavar="ID", help="list the nodes ID transitively depends on, then exit")
+    p.add_argument("--impact", metavar="ID", help="print what must be revisited if ID is false, then exit")
+    p.add_argument("--json", action="store_true", help="with --impact, print JSON")
+    p.add_argument("--all", action="store_true", help="check current-session.yaml and sessions/**/*.yaml together")
+    p.add_argument("--jobs", type=int, default=0, help="worker processes for --all (default: CPU count)")
+    p.add_argument("--no-cache", action="store_true", help="revalidate every node and leave the cache untouched")
     args = p.parse_args()
 
     root = Path(args.root)
+    if args.all:
+        return check_all(root, args.jobs)
+
     session = root / args.session
     if not session.exists():
         print(f"missing: {session}")
         return 1
 
-    text = session.read_text(encoding="utf-8")
-    all_ids = ID_RE.findall(text)
-    definitions = ID_DEF_RE.findall(text)
-    defined_ids = set(definitions)
-    missing_sections = [s for s in REQUIRED_SECTIONS if f"{s}:" not in text]
-    duplicate_ids = sorted({id_ for id_, count in Counter(definitions).items() if count > 1})
-    dangling_refs = sorted(set(all_ids) - defined_ids)
+    try:
+        graph = load_graph(session)
+    except Exception as exc:  # YAML errors differ between PyYAML and the subset parser
+        print(f"could not parse {session}: {exc}")
+        return 2
+
+    if args.impact:
+        return print_impact(graph, args.impact.upper(), args.json)
+
+    if args.reachable:
+        start = args.reachable.upper()
+        if start not in graph.nodes:
+            print(f"unknown node: {start}")
+            return 1
+        for node_id, depth in sorted(graph.reachable(start).items(), key=lambda kv: (kv[1], kv[0])):
+            print(f"- {node_id} (depth {depth})")
+        return 0
+
+    cache_path = check_cache_path(root, session)
+    result = validate_nodes(graph, None if args.no_cache else load_check_cache(cache_path))
+    if not args.no_cache:
+        try:
+            save_check_cache(cache_path, result)
+        except OSError as exc:
+            print(f"warning: could not write cache {cache_path}: {exc}")
+
+    dangling_refs: Dict[str, Set[str]] = defaultdict(set)
+    node_warnings: List[str] = []
+    for node_id, issues in result.issues.items():
+        for issue in issues:
+            if issue["code"] == "dangling":
+                dangling_refs[issue["ref"]].add(f"{node_id}.{issue['via']}")
+            else:
+                node_warnings.append(f"{node_id}: {WARNING_MESSAGES[issue['code']].format(**issue)}")
+    # Mentions from prose outside nodes (open_questions etc.) are not cached per node.
+    for target, edges in graph.dangling_refs().items():
+        for edge in edges:
+            if edge.source not in graph.nodes:
+                dangling_refs[target].add(f"{edge.source}.{edge.kind}")
+
+    missing_sections = graph.missing_sections()
+    duplicate_ids = graph.duplicate_ids()
+    cycles = graph.find_cycles()
 
     print(f"trace session: {session}")
-    print(f"trace ids: {len(all_ids)} occurrences, {len(defined_ids)} defined nodes")
+    print(f"trace ids: {len(graph.edges)} references, {len(graph.nodes)} defined nodes")
     if missing_sections:
         print("missing sections:")
         for s in missing_sections:
@@ -53,25 +210,40 @@ def main() -> int:
     if duplicate_ids:
         print("duplicate id definitions:")
         for i in duplicate_ids:
-            print(f"  - {i}")
+            print(f"  - {i} ({graph.definitions[i]} definitions)")
     else:
         print("id uniqueness: ok")
 
     if dangling_refs:
         print("dangling references (referenced but never defined as a node id):")
-        for i in dangling_refs:
-            print(f"  - {i}")
+        for i in sorted(dangling_refs):
+            print(f"  - {i} (from {', '.join(sorted(dangling_refs[i]))})")
     else:
         print("reference resolution: ok")
 
-    if "confidence:" not in text:
+    if cycles:
+        print(f"dependency cycles ({'/'.join(DEPENDENCY_EDGES)}):")
+        for cycle in cycles:
+            print(f"  - {' -> '.join(cycle)}")
+    else:
+        print("dependency cycles: none")
+
+    if node_warnings:
+        print("node warnings:")
+        for w in node_warnings:
+            print(f"  - {w}")
+
+    if not graph.has_field("confidence"):
         print("warning: no confidence markers found")
-    if "depends_on:" not in text:
+    if not graph.has_field("depends_on"):
         print("warning: no dependency markers found")
-    if "status:" not in text:
+    if not graph.has_field("status"):
         print("warning: no status markers found")
 
-    ok = not missing_sections and not duplicate_ids and not dangling_refs
+    if not args.no_cache:
+        print(f"incremental: {result.rechecked} node(s) rechecked, {result.reused} reused from {cache_path}")
+
+    ok = not missing_sections and not duplicate_ids and not dangling_refs and not cycles
     return 0 if ok else 2
 
 
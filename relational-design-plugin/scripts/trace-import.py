@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""One-shot import of the JSONL hook event log into the SQLite event store.
+
+Reads the sealed segments listed in `events/manifest.json` and then the
+active `hook-events.jsonl` (or only `--source FILE`), in order, and inserts
+them into `events/hook-events.sqlite` in batched transactions. Set
+`event_backend: sqlite` in the plugin settings afterwards so hooks and
+reports use the database.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Iterator
+
+import trace_db
+from trace_segments import iter_lines, iter_segment_lines
+from trace_store import ACTIVE_LOG, events_dir
+
+
+def read_records(lines: Iterator[bytes]) -> Iterator[dict]:
+    for line in lines:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(item, dict):
+            yield item
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--root", default=".relational-design")
+    p.add_argument("--source", help=f"import only this JSONL file (default: all segments and {ACTIVE_LOG})")
+    p.add_argument("--append", action="store_true", help="import even if the database already has events")
+    p.add_argument("--batch", type=int, default=10000, help="records per transaction")
+    args = p.parse_args()
+
+    root = Path(args.root)
+    directory = events_dir(root)
+    if args.source:
+        source = Path(args.source)
+        if not source.exists():
+            print(f"missing: {source}")
+            return 1
+        lines = iter_segment_lines(source)
+    else:
+        if not directory.exists():
+            print(f"missing: {directory}")
+            return 1
+        lines = iter_lines(directory)
+
+    conn = trace_db.connect(root)
+    existing = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    if existing and not args.append:
+        print(f"{trace_db.database_path(root)} already has {existing} events; pass --append to import anyway")
+        return 1
+
+    started = time.perf_counter()
+    imported = 0
+    batch = []
+    for item in read_records(lines):
+        batch.append(item)
+        if len(batch) >= args.batch:
+            imported += trace_db.insert_records(conn, batch)
+            batch = []
+    imported += trace_db.insert_records(conn, batch)
+    elapsed = time.perf_counter() - started
+    print(f"imported {imported} events into {trace_db.database_path(root)} in {elapsed:.2f} s")
+    print("set `event_backend: sqlite` in .claude/relational-design-plugin.local.md to use it")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,37 +1,307 @@
 #!/usr/bin/env python3
-"""Generate a lightweight Markdown report from Relational Design hook events."""
+"""Generate a lightweight Markdown report from Relational Design hook events.
+
+The report is a single streaming pass: sealed segments contribute their
+manifest summaries and the active segment is aggregated line by line.
+With `--checkpoint`, the active-segment aggregate and byte offset are
+persisted so the next report only reads newly appended bytes.
+
+Filters (`--since/--until/--session/--agent`) and `--analytics` switch to
+the columnar cache and add per-session edit rates and edit-to-trace
+latency: the time from a design edit to the next write of a trace session
+file (`.relational-design/**/*.yaml`) in the same session.
+
+`--latency` summarizes the hook timings in `events/hook-metrics.jsonl`:
+p50/p95/p99 of the total and of each stage, per phase.
+
+With `event_backend: sqlite` both modes query `events/hook-events.sqlite`
+instead: the plain report is a few `GROUP BY` queries.
+"""
 from __future__ import annotations
 
 import argparse
 import json
+import math
+import os
+import re
+import time
 from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
 
+from trace_columns import FLAG_DESIGN, FLAG_TRACE_SESSION, EventColumns, iter_columns
+from trace_segments import active_identity, sealed_segments, summarize_file
+from trace_store import ACTIVE_LOG, METRICS_LOG, events_dir, iter_metrics, load_settings, use_sqlite
 
-def main() -> int:
-    p = argparse.ArgumentParser()
-    p.add_argument("--root", default=".relational-design")
-    args = p.parse_args()
+CHECKPOINT_VERSION = 2
 
-    root = Path(args.root)
-    log = root / "events" / "hook-events.jsonl"
-    if not log.exists():
-        print("# Relational Design Event Report\n\nNo hook event log found.")
-        return 0
 
-    events = []
-    for line in log.read_text(encoding="utf-8").splitlines():
-        try:
-            events.append(json.loads(line))
-        except Exception:
+def checkpoint_path(root: Path) -> Path:
+    return root / "cache" / "report-checkpoint.json"
+
+
+def load_checkpoint(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == CHECKPOINT_VERSION else {}
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(checkpoint, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def active_summary(active: Path, checkpoint_file: Optional[Path]) -> Dict[str, Any]:
+    """Aggregate the active segment, resuming from a checkpoint when it still describes this file."""
+    if not active.exists():
+        return {}
+    if checkpoint_file is None:
+        return summarize_file(active)[0]
+    stat = active.stat()
+    identity = active_identity(active.parent, stat)
+    checkpoint = load_checkpoint(checkpoint_file)
+    # Rotation starts a different file (which may reuse the inode); truncation makes it shorter.
+    if checkpoint.get("identity") == identity and checkpoint.get("offset", 0) <= stat.st_size:
+        summary, offset = summarize_file(active, checkpoint["offset"], checkpoint["summary"])
+    else:
+        summary, offset = summarize_file(active)
+    try:
+        save_checkpoint(checkpoint_file, {
+            "version": CHECKPOINT_VERSION,
+            "identity": identity,
+            "offset": offset,
+            "summary": summary,
+        })
+    except OSError:
+        pass
+    return summary
+
+
+RELATIVE_TIME_RE = re.compile(r"^(\d+(?:\.\d+)?)([mhd])$")
+RELATIVE_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value: str) -> float:
+    """ISO 8601 (naive means UTC) or a relative age such as `90m`, `12h`, `7d`; an argparse type."""
+    match = RELATIVE_TIME_RE.match(value)
+    if match:
+        return time.time() - float(match.group(1)) * RELATIVE_UNITS[match.group(2)]
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected ISO 8601 or an age like 12h or 7d, got {value!r}") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return float("nan")
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def format_duration(seconds: float) -> str:
+    if math.isnan(seconds):
+        return "-"
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+@dataclass
+class SessionStats:
+    events: int = 0
+    design_edits: int = 0
+    first: float = math.inf
+    last: float = -math.inf
+    pending_edits: List[float] = field(default_factory=list)
+
+
+@dataclass
+class Analytics:
+    total: int = 0
+    by_phase: Counter = field(default_factory=Counter)
+    files: Counter = field(default_factory=Counter)
+    sessions: Dict[str, SessionStats] = field(default_factory=dict)
+    latencies: List[float] = field(default_factory=list)
+
+
+def analyze(
+    tables: Iterable[EventColumns],
+    since: Optional[float],
+    until: Optional[float],
+    session: Optional[str],
+    agent: Optional[str],
+) -> Analytics:
+    """One pass over the column tables; rows are taken in append order."""
+    result = Analytics()
+    lower = -math.inf if since is None else since
+    upper = math.inf if until is None else until
+    for table in tables:
+        c = table.columns
+        ts, phases, sessions, agents, files, flags = c["ts"], c["phase"], c["session"], c["agent"], c["file"], c["flags"]
+        phase_names, session_names, file_names = table.dicts["phase"], table.dicts["session"], table.dicts["file"]
+        post = table.dicts["phase"].index("post-tool-use") if "post-tool-use" in table.dicts["phase"] else -1
+        session_code = session_names.index(session) if session in session_names else -1
+        agent_code = table.dicts["agent"].index(agent) if agent in table.dicts["agent"] else -1
+        if (session is not None and session_code < 0) or (agent is not None and agent_code < 0):
             continue
+        for i in range(len(table)):
+            t = ts[i]
+            # Rows without a timestamp only pass when no time window is set.
+            if not (lower <= t <= upper) and not (since is None and until is None):
+                continue
+            if session is not None and sessions[i] != session_code:
+                continue
+            if agent is not None and agents[i] != agent_code:
+                continue
+            result.total += 1
+            result.by_phase[phase_names[phases[i]]] += 1
+            sid = session_names[sessions[i]] or "(no session)"
+            stats = result.sessions.get(sid)
+            if stats is None:
+                stats = result.sessions[sid] = SessionStats()
+            stats.events += 1
+            if t == t:  # not NaN
+                stats.first = min(stats.first, t)
+                stats.last = max(stats.last, t)
+            if phases[i] != post:
+                continue
+            flag = flags[i]
+            if flag & FLAG_DESIGN:
+                stats.design_edits += 1
+                result.files[file_names[files[i]]] += 1
+                stats.pending_edits.append(t)
+            if flag & FLAG_TRACE_SESSION and stats.pending_edits:
+                result.latencies.extend(max(0.0, t - e) for e in stats.pending_edits)
+                stats.pending_edits.clear()
+    return result
+
+
+def print_analytics(result: Analytics, args: argparse.Namespace, elapsed: float) -> None:
+    window = []
+    for k in ("since", "until", "session", "agent"):
+        value = getattr(args, k)
+        if value is None:
+            continue
+        if k in ("since", "until"):
+            # Already parsed to epoch seconds; show them as UTC.
+            value = datetime.fromtimestamp(value, timezone.utc).isoformat(timespec="seconds")
+        window.append(f"{k}={value}")
+    print("# Relational Design Event Report\n")
+    print(f"Filters: {', '.join(window) if window else 'none'}\n")
+    print(f"Total events: {result.total}\n")
+    print("## By phase")
+    for phase, n in result.by_phase.most_common():
+        print(f"- {phase}: {n}")
+    print("\n## Design-related edited files")
+    if result.files:
+        for path, n in result.files.most_common():
+            print(f"- `{path}`: {n}")
+    else:
+        print("No design-related edits detected.")
+
+    print("\n## Sessions\n")
+    print("| session | events | design edits | span | design edits / hour |")
+    print("|---|---:|---:|---:|---:|")
+    for sid, stats in sorted(result.sessions.items(), key=lambda kv: -kv[1].design_edits):
+        span = stats.last - stats.first if stats.last >= stats.first else float("nan")
+        rate = stats.design_edits / (span / 3600) if span and span == span else float("nan")
+        rate_text = "-" if math.isnan(rate) else f"{rate:.1f}"
+        print(f"| {sid} | {stats.events} | {stats.design_edits} | {format_duration(span)} | {rate_text} |")
+
+    edits = sum(s.design_edits for s in result.sessions.values())
+    latencies = sorted(result.latencies)
+    print("\n## Edit-to-trace latency\n")
+    print(f"- design edits followed by a trace session update: {len(latencies)} / {edits}")
+    if latencies:
+        print(f"- p50: {format_duration(percentile(latencies, 50))}")
+        print(f"- p95: {format_duration(percentile(latencies, 95))}")
+        print(f"- max: {format_duration(latencies[-1])}")
+    print(f"\n_Query time: {elapsed * 1000:.0f} ms_")
+
+
+LATENCY_STAGES = ["startup", "read", "import", "parse", "settings", "append", "session_check", "count", "emit"]
+
 
-    by_phase = Counter(e.get("phase", "unknown") for e in events)
-    design_edits = [e for e in events if e.get("phase") == "post-tool-use" and e.get("is_design_file")]
-    files = Counter(e.get("file_path", "") for e in design_edits if e.get("file_path"))
+def print_latency(root: Path) -> int:
+    totals: Dict[str, List[float]] = {}
+    stages: Dict[str, Dict[str, List[float]]] = {}
+    skipped: Counter = Counter()
+    daemon: Counter = Counter()
+    for record in iter_metrics(root):
+        phase = record.get("phase", "unknown")
+        totals.setdefault(phase, []).append(float(record.get("total_ms", 0)))
+        for name, ms in (record.get("stages") or {}).items():
+            stages.setdefault(phase, {}).setdefault(name, []).append(float(ms))
+        skipped[phase] += bool(record.get("skipped_append"))
+        daemon[phase] += bool(record.get("daemon"))
+
+    print("# Relational Design Hook Latency\n")
+    if not totals:
+        print(f"No hook metrics found in {events_dir(root) / METRICS_LOG}.")
+        return 0
+    print("| phase | stage | calls | p50 ms | p95 ms | p99 ms | max ms |")
+    print("|---|---|---:|---:|---:|---:|---:|")
+    for phase in sorted(totals):
+        rows = [("total", totals[phase])]
+        phase_stages = stages.get(phase, {})
+        ordered = [n for n in LATENCY_STAGES if n in phase_stages] + sorted(set(phase_stages) - set(LATENCY_STAGES))
+        rows += [(name, phase_stages[name]) for name in ordered]
+        for name, values in rows:
+            values.sort()
+            print(
+                f"| {phase} | {name} | {len(values)} | {percentile(values, 50):.2f} | {percentile(values, 95):.2f}"
+                f" | {percentile(values, 99):.2f} | {values[-1]:.2f} |"
+            )
+    print("\n## Calls\n")
+    for phase in sorted(totals):
+        print(f"- {phase}: {len(totals[phase])} call(s), {daemon[phase]} via daemon, {skipped[phase]} log write(s) skipped over budget")
+    return 0
+
+
+def wants_analytics(args: argparse.Namespace) -> bool:
+    return bool(args.analytics or args.since is not None or args.until is not None or args.session or args.agent)
+
+
+def sqlite_report(root: Path, args: argparse.Namespace) -> int:
+    import trace_db
+
+    if not trace_db.database_path(root).exists():
+        print("# Relational Design Event Report\n\nNo hook event database found.")
+        return 0
+    if wants_analytics(args):
+        started = time.perf_counter()
+        tables = trace_db.iter_columns(root, args.session, args.agent)
+        result = analyze(tables, args.since, args.until, args.session, args.agent)
+        print_analytics(result, args, time.perf_counter() - started)
+        return 0
+    print_summaries([trace_db.summary(root)])
+    return 0
+
+
+def print_summaries(summaries: List[Dict[str, Any]]) -> None:
+    total = 0
+    by_phase: Counter = Counter()
+    files: Counter = Counter()
+    for summary in summaries:
+        total += summary.get("events", 0)
+        by_phase.update(summary.get("by_phase", {}))
+        files.update(summary.get("design_files", {}))
 
     print("# Relational Design Event Report\n")
-    print(f"Total events: {len(events)}\n")
+    print(f"Total events: {total}\n")
     print("## By phase")
     for phase, n in by_phase.most_common():
         print(f"- {phase}: {n}")
@@ -41,6 +311,47 @@ def main() -> int:
             print(f"- `{path}`: {n}")
     else:
         print("No design-related edits detected.")
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--root", default=".relational-design")
+    p.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="persist the aggregate in cache/report-checkpoint.json and only read new bytes next time",
+    )
+    p.add_argument("--since", type=parse_time, help="only events at or after this time (ISO 8601 or e.g. 7d, 12h)")
+    p.add_argument("--until", type=parse_time, help="only events at or before this time (ISO 8601 or e.g. 1d)")
+    p.add_argument("--session", help="only events from this session_id")
+    p.add_argument("--agent", help="only events from this agent_type")
+    p.add_argument("--analytics", action="store_true", help="add per-session rates and edit-to-trace latency")
+    p.add_argument("--latency", action="store_true", help="per-phase hook latency percentiles from events/hook-metrics.jsonl")
+    args = p.parse_args()
+
+    root = Path(args.root)
+    if args.latency:
+        return print_latency(root)
+    if use_sqlite(load_settings(root.parent)):
+        return sqlite_report(root, args)
+
+    directory = events_dir(root)
+    active = directory / ACTIVE_LOG
+    segments = sealed_segments(directory)
+    if not segments and not active.exists():
+        print("# Relational Design Event Report\n\nNo hook event log found.")
+        return 0
+
+    if wants_analytics(args):
+        started = time.perf_counter()
+        result = analyze(iter_columns(root), args.since, args.until, args.session, args.agent)
+        print_analytics(result, args, time.perf_counter() - started)
+        return 0
+
+    # Sealed segments carry precomputed summaries; only the active log is read.
+    summaries = list(segments)
+    summaries.append(active_summary(active, checkpoint_path(root) if args.checkpoint else None))
+    print_summaries(summaries)
     return 0
 
 
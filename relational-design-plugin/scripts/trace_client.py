@@ -0,0 +1,201 @@
+"""Forwarding client for trace-hook.py: all a hook call loads while the daemon is up.
+
+It imports nothing beyond os, sys and the C `_socket` module (`stat` and
+`time` are already loaded or built in), so a forwarded call costs interpreter
+start-up plus one socket round trip. The handlers in `trace_handlers.py`
+are imported only to serve, or to handle a call in-process when no
+daemon accepted it.
+
+Protocol, one connection per hook call: the client sends a header line
+`<phase> <cwd bytes> <elapsed ms> <startup ms> <read ms>\\n`, the cwd, then
+the raw stdin payload, and shuts down its write side. The daemon answers
+DAEMON_OK followed by the hook's JSON output, if any, or DAEMON_FAILED
+when it rejected the request before handling it. Only a connect or send
+failure, or DAEMON_FAILED, makes the client run the hook itself: once the
+daemon has the request, running it again would log the event twice.
+"""
+from __future__ import annotations
+
+import os
+# The C module: `socket` itself pulls in enum and selectors, which cost more than the round trip.
+import _socket as socket
+import stat
+import sys
+import time
+
+PHASES = ["session-start", "pre-tool-use", "post-tool-use", "subagent-stop", "stop"]
+SOCKET_ENV = "RELATIONAL_DESIGN_HOOK_SOCKET"
+# The client must give up well inside the 5 s hook timeout in hooks.json.
+CLIENT_TIMEOUT_SECONDS = 2.0
+# First line of every daemon reply.
+DAEMON_OK = b'{"status": "ok"}\n'
+DAEMON_FAILED = b'{"status": "error"}\n'
+USAGE = f"usage: trace-hook.py {{{','.join(PHASES)},serve}} [--socket PATH]"
+
+
+def current_uid() -> int:
+    return os.getuid() if hasattr(os, "getuid") else 0
+
+
+def daemon_socket_path() -> str:
+    configured = os.environ.get(SOCKET_ENV)
+    if configured:
+        return configured
+    # A per-user 0700 directory, so the socket is private even when the
+    # runtime dir falls back to a shared /tmp. tempfile is not imported: it
+    # costs more than the whole forwarded call.
+    runtime_dir = (
+        os.environ.get("XDG_RUNTIME_DIR")
+        or os.environ.get("TMPDIR")
+        or os.environ.get("TEMP")
+        or os.environ.get("TMP")
+        or "/tmp"
+    )
+    return os.path.join(runtime_dir, f"relational-design-{current_uid()}", "hook.sock")
+
+
+def private_dir(directory: str) -> bool:
+    """True if `directory` is a real directory owned by this user that nobody else can write to."""
+    try:
+        st = os.lstat(directory)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == current_uid() and not st.st_mode & 0o022
+
+
+def trusted_socket(socket_path: str) -> bool:
+    """The daemon socket is ours: a socket owned by this user, in a private directory."""
+    try:
+        st = os.lstat(socket_path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISSOCK(st.st_mode)
+        and st.st_uid == current_uid()
+        and private_dir(os.path.dirname(socket_path) or ".")
+    )
+
+
+def peer_is_current_user(client: socket.socket) -> bool:
+    """Check the listening process's uid where the platform reports it (SO_PEERCRED on Linux)."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    # struct ucred {pid_t pid; uid_t uid; gid_t gid;}: three native 32-bit ints.
+    creds = client.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, 12)
+    return int.from_bytes(creds[4:8], sys.byteorder) == current_uid()
+
+
+def encode_request(phase: str, cwd: str, started: float, startup_ms: float, read_ms: float) -> bytes:
+    """The header line and cwd; `elapsed` lets the daemon continue the client's clock."""
+    cwd_bytes = os.fsencode(cwd)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    header = f"{phase} {len(cwd_bytes)} {elapsed_ms:.3f} {startup_ms:.3f} {read_ms:.3f}\n"
+    return header.encode("ascii") + cwd_bytes
+
+
+def forward_to_daemon(
+    socket_path: str,
+    phase: str,
+    raw: bytes,
+    started: float,
+    startup_ms: float = 0.0,
+    read_ms: float = 0.0,
+) -> bytes | None:
+    """Hand the payload to a running daemon; None means the caller must handle the call itself.
+
+    Returns the reply body (possibly empty) once the daemon has the request,
+    even if the reply is then lost to a timeout: the event may already be
+    logged, so it must not be handled twice.
+    """
+    if not hasattr(socket, "AF_UNIX") or not trusted_socket(socket_path):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CLIENT_TIMEOUT_SECONDS)
+        try:
+            client.connect(socket_path)
+            if not peer_is_current_user(client):
+                return None
+            client.sendall(encode_request(phase, os.getcwd(), started, startup_ms, read_ms) + raw)
+            client.shutdown(socket.SHUT_WR)
+        except OSError:
+            return None
+        chunks = []
+        try:
+            while True:
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except OSError:
+            return b""
+    finally:
+        client.close()
+    reply = b"".join(chunks)
+    if reply.startswith(DAEMON_FAILED):
+        return None
+    if reply.startswith(DAEMON_OK):
+        return reply[len(DAEMON_OK):]
+    return b""
+
+
+def parse_args(argv: list[str]) -> tuple[str, str | None]:
+    """`phase` and `--socket PATH`, without the cost of importing argparse."""
+    phase = None
+    socket_path = None
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-h", "--help"):
+            print(USAGE)
+            raise SystemExit(0)
+        if arg == "--socket":
+            socket_path = next(args, None)
+            if socket_path is None:
+                usage_error("--socket needs a path")
+        elif arg.startswith("--socket="):
+            socket_path = arg[len("--socket="):]
+        elif phase is None and arg in PHASES + ["serve"]:
+            phase = arg
+        else:
+            usage_error(f"unexpected argument: {arg}")
+    if phase is None:
+        usage_error("a phase is required")
+    return phase, socket_path
+
+
+def usage_error(message: str) -> None:
+    print(f"{USAGE}\ntrace-hook.py: error: {message}", file=sys.stderr)
+    raise SystemExit(2)
+
+
+def main(started: float | None = None) -> int:
+    """`started` is trace-hook.py's first perf_counter reading; hook timings count from it."""
+    if started is None:
+        started = time.perf_counter()
+    phase, socket_path = parse_args(sys.argv[1:])
+    socket_path = socket_path or daemon_socket_path()
+    if phase == "serve":
+        from trace_handlers import serve
+
+        return serve(socket_path)
+
+    read_started = time.perf_counter()
+    raw = sys.stdin.buffer.read()
+    read_ms = (time.perf_counter() - read_started) * 1000
+    startup_ms = (read_started - started) * 1000
+    reply = forward_to_daemon(socket_path, phase, raw, started, startup_ms, read_ms)
+    if reply is not None:
+        if reply:
+            sys.stdout.write(reply.decode("utf-8") + "\n")
+        return 0
+
+    import_started = time.perf_counter()
+    from trace_handlers import run_in_process
+
+    stages = {
+        "startup": startup_ms,
+        "read": read_ms,
+        "import": (time.perf_counter() - import_started) * 1000,
+    }
+    run_in_process(phase, raw, started, stages)
+    return 0
@@ -0,0 +1,192 @@
+"""Columnar cache of the hook event log for trace-report analytics.
+
+Analytics queries read compact binary column files instead of JSON. Each
+segment gets `cache/columns/<segment>.cols`: a magic line, a JSON header
+(source identity, string dictionaries, column layout) and the raw bytes of
+one `array` per column. Sealed segments are converted once; the active
+segment's file is extended from the last converted byte offset.
+"""
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from trace_segments import active_identity, iter_segment_lines, sealed_segments
+from trace_store import ACTIVE_LOG, events_dir
+
+COLUMNS_MAGIC = b"RDCOL1\n"
+COLUMN_TYPES = [
+    ("ts", "d"),
+    ("phase", "I"),
+    ("session", "I"),
+    ("agent", "I"),
+    ("tool", "I"),
+    ("file", "I"),
+    ("flags", "B"),
+]
+DICT_COLUMNS = ("phase", "session", "agent", "tool", "file")
+FLAG_DESIGN = 1
+FLAG_TRACE_ID = 2
+FLAG_TRACE_SESSION = 4
+
+
+def is_trace_session_path(path: str) -> bool:
+    normalized = path.replace("\\", "/")
+    return ".relational-design/" in normalized and normalized.endswith((".yaml", ".yml"))
+
+
+def parse_timestamp(value: Any) -> float:
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return float("nan")
+
+
+class EventColumns:
+    """One segment's events as typed arrays plus per-column string dictionaries."""
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, array] = {name: array(code) for name, code in COLUMN_TYPES}
+        self.dicts: Dict[str, List[str]] = {name: [] for name in DICT_COLUMNS}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in DICT_COLUMNS}
+        self.source: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns["ts"])
+
+    def code(self, column: str, value: Any) -> int:
+        key = "" if value is None else str(value)
+        codes = self._codes[column]
+        if key not in codes:
+            codes[key] = len(self.dicts[column])
+            self.dicts[column].append(key)
+        return codes[key]
+
+    def add(self, item: Dict[str, Any]) -> None:
+        c = self.columns
+        c["ts"].append(parse_timestamp(item.get("timestamp")))
+        c["phase"].append(self.code("phase", item.get("phase", "unknown")))
+        c["session"].append(self.code("session", item.get("session_id")))
+        c["agent"].append(self.code("agent", item.get("agent_type")))
+        c["tool"].append(self.code("tool", item.get("tool_name")))
+        path = item.get("file_path") or ""
+        c["file"].append(self.code("file", path))
+        flags = FLAG_DESIGN if item.get("is_design_file") else 0
+        if item.get("has_inline_trace_id"):
+            flags |= FLAG_TRACE_ID
+        if path and is_trace_session_path(path):
+            flags |= FLAG_TRACE_SESSION
+        c["flags"].append(flags)
+
+    def add_lines(self, lines: Iterable[bytes]) -> None:
+        for line in lines:
+            try:
+                self.add(json.loads(line))
+            except (ValueError, AttributeError):
+                continue
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {
+            "source": self.source,
+            "rows": len(self),
+            "dicts": self.dicts,
+            "columns": COLUMN_TYPES,
+        }
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            f.write(COLUMNS_MAGIC)
+            f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+            for name, _ in COLUMN_TYPES:
+                self.columns[name].tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["EventColumns"]:
+        try:
+            with path.open("rb") as f:
+                if f.readline() != COLUMNS_MAGIC:
+                    return None
+                header = json.loads(f.readline())
+                if [tuple(c) for c in header["columns"]] != COLUMN_TYPES:
+                    return None
+                table = cls()
+                for name, _ in COLUMN_TYPES:
+                    table.columns[name].fromfile(f, header["rows"])
+        except (OSError, ValueError, EOFError, KeyError):
+            return None
+        table.source = header["source"]
+        table.dicts = header["dicts"]
+        table._codes = {name: {v: i for i, v in enumerate(values)} for name, values in table.dicts.items()}
+        return table
+
+
+def columns_dir(root: Path) -> Path:
+    return root / "cache" / "columns"
+
+
+def segment_columns(root: Path, segment: Dict[str, Any]) -> EventColumns:
+    """Columns for a sealed segment, converted on first use."""
+    source = events_dir(root) / segment["name"]
+    cache = columns_dir(root) / f"{segment['name']}.cols"
+    identity = {"name": segment["name"], "size": source.stat().st_size}
+    table = EventColumns.load(cache)
+    if table is not None and table.source == identity:
+        return table
+    table = EventColumns()
+    table.add_lines(iter_segment_lines(source))
+    table.source = identity
+    try:
+        table.save(cache)
+    except OSError:
+        pass
+    return table
+
+
+def active_columns(root: Path) -> Optional[EventColumns]:
+    """Columns for the active segment, extended from the last converted offset."""
+    active = events_dir(root) / ACTIVE_LOG
+    if not active.exists():
+        return None
+    stat = active.stat()
+    identity = active_identity(active.parent, stat)
+    cache = columns_dir(root) / f"{ACTIVE_LOG}.cols"
+    table = EventColumns.load(cache)
+    offset = 0
+    # Same check as the report checkpoint: the inode alone survives rotation.
+    if (
+        table is not None
+        and table.source.get("identity") == identity
+        and table.source.get("offset", 0) <= stat.st_size
+    ):
+        offset = table.source["offset"]
+    else:
+        table = EventColumns()
+    if offset == stat.st_size:
+        return table
+    with active.open("rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            table.add_lines([line])
+    table.source = {"identity": identity, "offset": offset}
+    try:
+        table.save(cache)
+    except OSError:
+        pass
+    return table
+
+
+def iter_columns(root: Path) -> Iterator[EventColumns]:
+    """Every segment's columns, oldest first."""
+    for segment in sealed_segments(events_dir(root)):
+        yield segment_columns(root, segment)
+    table = active_columns(root)
+    if table is not None:
+        yield table
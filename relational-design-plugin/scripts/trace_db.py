@@ -0,0 +1,181 @@
+"""Optional SQLite event store for the Relational Design hooks.
+
+With `event_backend: sqlite` in the plugin settings, hook events go to
+`.relational-design/events/hook-events.sqlite` instead of the JSONL log.
+The database runs in WAL mode so the report can read while hooks append,
+and is indexed on `(phase, is_design_file)` and `session_id` so the Stop
+hook's count and the report are index lookups and `GROUP BY` queries
+rather than log scans. `scripts/trace-import.py` copies an existing JSONL
+log into it.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from trace_columns import EventColumns
+from trace_store import events_dir
+
+DATABASE = "hook-events.sqlite"
+SCHEMA_VERSION = 1
+# Record keys written by trace_handlers.safe_event_record, in column order.
+COLUMNS = (
+    "timestamp",
+    "phase",
+    "hook_event_name",
+    "session_id",
+    "cwd",
+    "tool_name",
+    "tool_use_id",
+    "file_path",
+    "is_design_file",
+    "has_inline_trace_id",
+    "agent_type",
+)
+FLAG_COLUMNS = ("is_design_file", "has_inline_trace_id")
+COLUMN_DEFS = ",\n    ".join(
+    f"{c} INTEGER NOT NULL DEFAULT 0" if c in FLAG_COLUMNS else f"{c} TEXT" for c in COLUMNS
+)
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    {COLUMN_DEFS}
+);
+CREATE INDEX IF NOT EXISTS events_phase_design ON events (phase, is_design_file);
+CREATE INDEX IF NOT EXISTS events_session ON events (session_id);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+INSERT_SQL = f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+# The id range keeps "recent" equal to the JSONL tail window while the
+# (phase, is_design_file) index does the filtering.
+COUNT_RECENT_DESIGN_EDITS_SQL = """
+SELECT COUNT(*) FROM events
+WHERE phase = 'post-tool-use' AND is_design_file = 1
+  AND id > (SELECT COALESCE(MAX(id), 0) FROM events) - ?
+"""
+
+_connections: Dict[Path, sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def database_path(root: Path) -> Path:
+    return events_dir(root) / DATABASE
+
+
+def connect(root: Path, create: bool = True) -> Optional[sqlite3.Connection]:
+    """Open (and cache) the event database; None if it does not exist and `create` is false.
+
+    Connections are reused for the life of the process, which is what makes
+    the daemon's inserts cheap: the schema check and the prepared INSERT are
+    paid once.
+    """
+    path = database_path(root)
+    with _lock:
+        conn = _connections.get(path)
+        if conn is not None:
+            return conn
+        if not path.exists():
+            if not create:
+                return None
+            path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=2.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript(SCHEMA)
+        _connections[path] = conn
+        return conn
+
+
+def record_row(item: Dict[str, Any]) -> tuple:
+    return tuple(int(bool(item.get(c))) if c in FLAG_COLUMNS else item.get(c) for c in COLUMNS)
+
+
+def insert_records(conn: sqlite3.Connection, items: Iterable[Dict[str, Any]]) -> int:
+    rows = [record_row(item) for item in items]
+    with _lock, conn:
+        conn.executemany(INSERT_SQL, rows)
+    return len(rows)
+
+
+def insert_lines(root: Path, lines: List[bytes]) -> None:
+    """Insert encoded JSONL records (what EventWriter buffers) in one transaction."""
+    items = []
+    for line in lines:
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            continue
+    insert_records(connect(root), items)
+
+
+def count_recent_design_edits(root: Path, window: int) -> int:
+    conn = connect(root, create=False)
+    if conn is None:
+        return 0
+    with _lock:
+        return conn.execute(COUNT_RECENT_DESIGN_EDITS_SQL, (window,)).fetchone()[0]
+
+
+def summary(root: Path) -> Dict[str, Any]:
+    """The report aggregate (same shape as trace_segments.summarize) from GROUP BY queries."""
+    conn = connect(root, create=False)
+    if conn is None:
+        return {}
+    with _lock:
+        events, first_ts, last_ts = conn.execute(
+            "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM events"
+        ).fetchone()
+        by_phase = dict(conn.execute("SELECT phase, COUNT(*) FROM events GROUP BY phase"))
+        design_files = dict(conn.execute(
+            "SELECT file_path, COUNT(*) FROM events"
+            " WHERE phase = 'post-tool-use' AND is_design_file = 1 AND file_path != ''"
+            " GROUP BY file_path"
+        ))
+    return {
+        "events": events,
+        "first_ts": first_ts,
+        "last_ts": last_ts,
+        "by_phase": by_phase,
+        "design_files": design_files,
+    }
+
+
+def iter_columns(
+    root: Path,
+    session: Optional[str] = None,
+    agent: Optional[str] = None,
+    batch: int = 50000,
+) -> Iterator[EventColumns]:
+    """Rows in insertion order as column tables, for the report's analytics pass.
+
+    Session and agent filters are pushed into the query so the session index
+    narrows the scan.
+    """
+    conn = connect(root, create=False)
+    if conn is None:
+        return
+    where, params = [], []
+    if session is not None:
+        where.append("session_id = ?")
+        params.append(session)
+    if agent is not None:
+        where.append("agent_type = ?")
+        params.append(agent)
+    sql = f"SELECT {', '.join(COLUMNS)} FROM events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+    cursor = conn.execute(sql, params)
+    while True:
+        with _lock:
+            rows = cursor.fetchmany(batch)
+        if not rows:
+            return
+        table = EventColumns()
+        for row in rows:
+            table.add(dict(zip(COLUMNS, row)))
+        yield table
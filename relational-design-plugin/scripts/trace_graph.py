@@ -0,0 +1,686 @@
+"""Trace graph loader and queries for Relational Design sessions.
+
+`load_graph()` parses a trace session YAML once into typed nodes and edges.
+Every list item with an `RD-*` `id` in a top-level section is a node. A
+field value (or list element) that is exactly an ID becomes a structured edge
+named after the field (`depends_on`, `if_false_retract`, `based_on`,
+`target`, ...); IDs that appear inside prose become `mention` edges.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import yaml  # type: ignore
+except ModuleNotFoundError:
+    yaml = None
+
+ID_RE = re.compile(r"RD-(?:O|A|C|R|H|DD|AR|CR|RV|RT|BF)-\d+", re.I)
+FULL_ID_RE = re.compile(rf"^{ID_RE.pattern}$", re.I)
+REQUIRED_SECTIONS = [
+    "observations",
+    "assumptions",
+    "constraints",
+    "relations",
+    "hypotheses",
+    "decisions",
+    "artifacts",
+    "critiques",
+]
+# Edges along which a node relies on its target; cycles are only checked here.
+DEPENDENCY_EDGES = ("depends_on", "based_on")
+MENTION = "mention"
+# A node that still relies on a node in one of these states needs attention.
+WITHDRAWN_STATUSES = {"retracted", "superseded", "rejected", "invalidated"}
+CHECK_CACHE_VERSION = 1
+# Retraction impact: nodes pointing at the invalidated node through these fields are affected...
+IMPACT_REVERSE_EDGES = ("depends_on", "based_on", "target", "affected_decision", "violated_relation")
+# ...as are nodes it explicitly lists for retraction.
+IMPACT_FORWARD_EDGES = ("if_false_retract",)
+
+
+@dataclass
+class TraceNode:
+    id: str
+    section: str
+    kind: Optional[str]
+    status: Optional[str]
+    fields: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class TraceEdge:
+    source: str
+    target: str
+    kind: str
+
+
+@dataclass
+class TraceGraph:
+    nodes: Dict[str, TraceNode] = field(default_factory=dict)
+    edges: List[TraceEdge] = field(default_factory=list)
+    definitions: Counter = field(default_factory=Counter)
+    sections: Set[str] = field(default_factory=set)
+    session: Dict[str, Any] = field(default_factory=dict)
+    _out: Dict[str, List[TraceEdge]] = field(default_factory=lambda: defaultdict(list))
+    _in: Dict[str, List[TraceEdge]] = field(default_factory=lambda: defaultdict(list))
+
+    def add_node(self, node: TraceNode) -> None:
+        self.definitions[node.id] += 1
+        self.nodes.setdefault(node.id, node)
+
+    def add_edge(self, edge: TraceEdge) -> None:
+        self.edges.append(edge)
+        self._out[edge.source].append(edge)
+        self._in[edge.target].append(edge)
+
+    def out_edges(self, node_id: str, kinds: Optional[Tuple[str, ...]] = None) -> List[TraceEdge]:
+        return [e for e in self._out.get(node_id, ()) if kinds is None or e.kind in kinds]
+
+    def in_edges(self, node_id: str, kinds: Optional[Tuple[str, ...]] = None) -> List[TraceEdge]:
+        return [e for e in self._in.get(node_id, ()) if kinds is None or e.kind in kinds]
+
+    def missing_sections(self) -> List[str]:
+        return [s for s in REQUIRED_SECTIONS if s not in self.sections]
+
+    def duplicate_ids(self) -> List[str]:
+        return sorted(i for i, n in self.definitions.items() if n > 1)
+
+    def dangling_refs(self) -> Dict[str, List[TraceEdge]]:
+        """Referenced IDs that are never defined as a node, with the edges that reference them."""
+        dangling: Dict[str, List[TraceEdge]] = {}
+        for target, edges in self._in.items():
+            if target not in self.nodes:
+                dangling[target] = list(edges)
+        return dict(sorted(dangling.items()))
+
+    def has_field(self, name: str) -> bool:
+        return any(name in node.fields for node in self.nodes.values())
+
+    def reachable(self, start: str, kinds: Tuple[str, ...] = DEPENDENCY_EDGES, reverse: bool = False) -> Dict[str, int]:
+        """Breadth-first closure from `start` with the hop depth of each reached node."""
+        step = self.in_edges if reverse else self.out_edges
+        depth = {start: 0}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for edge in step(current, kinds):
+                nxt = edge.source if reverse else edge.target
+                if nxt not in depth:
+                    depth[nxt] = depth[current] + 1
+                    queue.append(nxt)
+        del depth[start]
+        return depth
+
+    def dependents(self, ids: Iterable[str]) -> Set[str]:
+        """Every node that reaches any of `ids` over any edge kind (multi-source reverse BFS)."""
+        seen = set(ids)
+        queue = deque(seen)
+        while queue:
+            current = queue.popleft()
+            for edge in self._in.get(current, ()):
+                if edge.source not in seen:
+                    seen.add(edge.source)
+                    queue.append(edge.source)
+        return seen
+
+    def find_cycles(self, kinds: Tuple[str, ...] = DEPENDENCY_EDGES) -> List[List[str]]:
+        """Strongly connected components with more than one node, or with a self-edge (Tarjan, iterative)."""
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        cycles: List[List[str]] = []
+        counter = 0
+        for root in sorted(self.nodes):
+            if root in index:
+                continue
+            work = [(root, iter(self.out_edges(root, kinds)))]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, edges = work[-1]
+                advanced = False
+                for edge in edges:
+                    target = edge.target
+                    if target not in self.nodes:
+                        continue
+                    if target not in index:
+                        index[target] = low[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.out_edges(target, kinds))))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        low[node] = min(low[node], index[target])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    self_loop = any(e.target == node for e in self.out_edges(node, kinds))
+                    if len(component) > 1 or self_loop:
+                        cycles.append(sorted(component))
+        return cycles
+
+
+# --- YAML loading -----------------------------------------------------------
+
+
+def load_yaml(text: str) -> Any:
+    """Load YAML with PyYAML when available, otherwise the built-in subset parser."""
+    if yaml is None:
+        return parse_yaml_subset(text)
+    return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+KEY_RE = re.compile(r"""^(?P<key>"[^"]*"|'[^']*'|[^\s'"\[\]{}#][^:]*?)\s*:(?:\s+(?P<value>.*))?$""")
+BLOCK_SCALARS = {"|", "|-", "|+", ">", ">-", ">+"}
+
+
+def scan_line(text: str) -> Tuple[int, int, Optional[str]]:
+    """Where a `#` comment starts (or len), the net `[`/`{` depth, and the quote left open.
+
+    Inside quotes `#` and brackets are literal; `''` (single) and `\\"`
+    (double) escapes do not close the quote.
+    """
+    quote = None
+    depth = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == "\\" and quote == '"':
+                i += 1
+            elif ch == quote:
+                if quote == "'" and text[i + 1:i + 2] == "'":
+                    i += 1
+                else:
+                    quote = None
+        elif ch in "'\"" and (not text[:i].strip() or text[:i].rstrip()[-1] in ":-[{,"):
+            quote = ch
+        elif ch == "#" and (i == 0 or text[i - 1] in " \t"):
+            return i, depth, None
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+        i += 1
+    return len(text), depth, quote
+
+
+def strip_comment(text: str) -> str:
+    return text[:scan_line(text)[0]].rstrip()
+
+
+def parse_flow(text: str) -> Any:
+    """Parse a flow collection or scalar such as `[RD-O-001, "a, b"]` or `{}`."""
+    value, rest = _parse_flow_item(text.strip())
+    return value if not rest.strip() else text.strip()
+
+
+def _parse_flow_item(text: str) -> Tuple[Any, str]:
+    text = text.lstrip()
+    if text.startswith("["):
+        items: List[Any] = []
+        text = text[1:].lstrip()
+        while text and not text.startswith("]"):
+            item, text = _parse_flow_item(text)
+            items.append(item)
+            text = text.lstrip()
+            if text.startswith(","):
+                text = text[1:].lstrip()
+        return items, text[1:]
+    if text.startswith("{"):
+        mapping: Dict[str, Any] = {}
+        text = text[1:].lstrip()
+        while text and not text.startswith("}"):
+            key, text = _parse_flow_scalar(text, ":")
+            text = text.lstrip()[1:] if text.lstrip().startswith(":") else text
+            value, text = _parse_flow_item(text)
+            mapping[str(key)] = value
+            text = text.lstrip()
+            if text.startswith(","):
+                text = text[1:].lstrip()
+        return mapping, text[1:]
+    return _parse_flow_scalar(text, ",]}")
+
+
+def _parse_flow_scalar(text: str, stops: str) -> Tuple[Any, str]:
+    if text[:1] in "'\"":
+        quote = text[0]
+        i = 1
+        while i < len(text):
+            if text[i] == "\\" and quote == '"':
+                i += 2
+                continue
+            if text[i] == quote:
+                if quote == "'" and text[i + 1:i + 2] == "'":
+                    i += 2
+                    continue
+                break
+            i += 1
+        return parse_scalar(text[:i + 1]), text[i + 1:]
+    i = 0
+    while i < len(text) and text[i] not in stops:
+        i += 1
+    return parse_scalar(text[:i]), text[i:]
+
+
+def parse_scalar(text: str) -> Any:
+    text = text.strip()
+    if not text or text in ("~", "null", "Null", "NULL"):
+        return None
+    if text[0] == '"' and text.endswith('"') and len(text) > 1:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text[1:-1]
+    if text[0] == "'" and text.endswith("'") and len(text) > 1:
+        return text[1:-1].replace("''", "'")
+    if text[0] in "[{":
+        return parse_flow(text)
+    lowered = text.lower()
+    if lowered in ("true", "yes", "on"):
+        return True
+    if lowered in ("false", "no", "off"):
+        return False
+    if re.fullmatch(r"[-+]?\d+", text):
+        return int(text)
+    if re.fullmatch(r"[-+]?(\d+\.\d*|\.\d+)([eE][-+]?\d+)?", text):
+        return float(text)
+    return text
+
+
+class _SubsetParser:
+    """Indentation-based parser for the block-YAML subset used by trace sessions."""
+
+    def __init__(self, text: str) -> None:
+        self.lines = text.splitlines()
+        self.pos = 0
+
+    def peek(self) -> Optional[Tuple[int, str]]:
+        while self.pos < len(self.lines):
+            raw = self.lines[self.pos]
+            content = strip_comment(raw)
+            if content.strip() and content.strip() not in ("---", "..."):
+                return len(content) - len(content.lstrip()), content.strip()
+            self.pos += 1
+        return None
+
+    @staticmethod
+    def is_item(text: str) -> bool:
+        return text == "-" or text.startswith("- ")
+
+    def parse_block(self) -> Any:
+        line = self.peek()
+        if line is None:
+            return None
+        indent, text = line
+        if self.is_item(text):
+            return self.parse_sequence(indent)
+        return self.parse_mapping(indent, {})
+
+    def parse_mapping(self, indent: int, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        while True:
+            line = self.peek()
+            if line is None or line[0] != indent or self.is_item(line[1]):
+                return mapping
+            match = KEY_RE.match(line[1])
+            if not match:
+                return mapping
+            self.pos += 1
+            key = parse_scalar(match.group("key"))
+            mapping[str(key)] = self.parse_value(match.group("value") or "", indent)
+
+    def parse_sequence(self, indent: int) -> List[Any]:
+        items: List[Any] = []
+        while True:
+            line = self.peek()
+            if line is None or line[0] != indent or not self.is_item(line[1]):
+                return items
+            self.pos += 1
+            body = line[1][1:].lstrip()
+            body_indent = indent + len(line[1]) - len(body)
+            match = KEY_RE.match(body) if body and body[0] not in "'\"[{" else None
+            if not body:
+                items.append(self.parse_value("", indent))
+            elif match:
+                mapping = {str(parse_scalar(match.group("key"))): self.parse_value(match.group("value") or "", body_indent)}
+                items.append(self.parse_mapping(body_indent, mapping))
+            else:
+                items.append(self.parse_value(body, indent))
+        return items
+
+    def join_continuation(self, text: str) -> str:
+        """Append the lines of a flow collection or quoted scalar left open on this line."""
+        while self.pos < len(self.lines):
+            _, depth, quote = scan_line(text)
+            if depth <= 0 and quote is None:
+                break
+            text = strip_comment(f"{text} {self.lines[self.pos].strip()}")
+            self.pos += 1
+        return text
+
+    def parse_value(self, text: str, parent_indent: int) -> Any:
+        if text in BLOCK_SCALARS:
+            return self.parse_block_scalar(text, parent_indent)
+        if text:
+            if text[0] in "[{'\"":
+                text = self.join_continuation(text)
+            value = parse_scalar(text)
+            if isinstance(value, str) and text[0] not in "'\"":
+                # Plain scalars may continue on more-indented lines.
+                parts = [value]
+                while True:
+                    line = self.peek()
+                    if line is None or line[0] <= parent_indent or self.is_item(line[1]) or KEY_RE.match(line[1]):
+                        break
+                    parts.append(line[1])
+                    self.pos += 1
+                value = " ".join(parts)
+            return value
+        line = self.peek()
+        if line is None:
+            return None
+        indent, body = line
+        if indent > parent_indent and not self.is_item(body) and not KEY_RE.match(body):
+            # A scalar or flow collection on the line after its key.
+            self.pos += 1
+            return self.parse_value(body, parent_indent)
+        if indent > parent_indent or (indent == parent_indent and self.is_item(body)):
+            return self.parse_block()
+        return None
+
+    def parse_block_scalar(self, style: str, parent_indent: int) -> str:
+        collected: List[str] = []
+        block_indent: Optional[int] = None
+        while self.pos < len(self.lines):
+            raw = self.lines[self.pos]
+            if raw.strip():
+                indent = len(raw) - len(raw.lstrip())
+                if indent <= parent_indent:
+                    break
+                if block_indent is None:
+                    block_indent = indent
+                collected.append(raw[block_indent:])
+            else:
+                collected.append("")
+            self.pos += 1
+        while collected and not collected[-1]:
+            collected.pop()
+        joiner = "\n" if style.startswith("|") else " "
+        text = joiner.join(collected)
+        return text if style.endswith("-") else text + "\n"
+
+
+def parse_yaml_subset(text: str) -> Any:
+    parser = _SubsetParser(text)
+    data = parser.parse_block()
+    if parser.peek() is not None:
+        # Rather than silently dropping the rest of the document.
+        raise ValueError(f"unsupported YAML at line {parser.pos + 1}: {parser.lines[parser.pos].strip()}")
+    return data
+
+
+# --- Graph construction -------------------------------------------------------
+
+
+def iter_strings(value: Any, path: str = "") -> Iterator[Tuple[str, str]]:
+    """Yield (field path, string) pairs for every scalar below `value`."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from iter_strings(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_strings(item, path)
+    elif value is not None and not isinstance(value, bool):
+        yield path, str(value)
+
+
+def node_edges(node_id: str, fields: Dict[str, Any]) -> Iterator[TraceEdge]:
+    for key, value in fields.items():
+        if key == "id":
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str) and FULL_ID_RE.match(item.strip()):
+                yield TraceEdge(node_id, item.strip().upper(), key)
+                continue
+            for _, text in iter_strings(item):
+                for ref in ID_RE.findall(text):
+                    yield TraceEdge(node_id, ref.upper(), MENTION)
+
+
+def build_graph(data: Any) -> TraceGraph:
+    graph = TraceGraph()
+    if not isinstance(data, dict):
+        return graph
+    graph.sections = {str(k) for k in data}
+    session = data.get("trace_session")
+    graph.session = session if isinstance(session, dict) else {}
+    pending: List[Tuple[str, Dict[str, Any]]] = []
+    for section, value in data.items():
+        items = value if isinstance(value, list) else []
+        for item in items:
+            node_id = item.get("id") if isinstance(item, dict) else None
+            if isinstance(node_id, str) and FULL_ID_RE.match(node_id.strip()):
+                node_id = node_id.strip().upper()
+                graph.add_node(TraceNode(
+                    id=node_id,
+                    section=str(section),
+                    kind=item.get("kind"),
+                    status=item.get("status"),
+                    fields=item,
+                ))
+                pending.append((node_id, item))
+            else:
+                # Prose outside nodes (open questions etc.) can still mention IDs.
+                for _, text in iter_strings(item):
+                    for ref in ID_RE.findall(text):
+                        graph.add_edge(TraceEdge(str(section), ref.upper(), MENTION))
+    for source, fields in pending:
+        for edge in node_edges(source, fields):
+            graph.add_edge(edge)
+    return graph
+
+
+def load_graph(path: Path) -> TraceGraph:
+    return build_graph(load_yaml(path.read_text(encoding="utf-8")))
+
+
+# --- Retraction impact ---------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class ImpactEntry:
+    id: str
+    section: Optional[str]
+    depth: int
+    via: str
+    parent: str
+
+
+def impact_index(graph: TraceGraph) -> Dict[str, List[Tuple[str, str]]]:
+    """node id -> [(affected node id, edge kind)], built once in O(E)."""
+    index: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+    for edge in graph.edges:
+        if edge.kind in IMPACT_REVERSE_EDGES:
+            index[edge.target].append((edge.source, edge.kind))
+        elif edge.kind in IMPACT_FORWARD_EDGES:
+            index[edge.source].append((edge.target, edge.kind))
+    return index
+
+
+def retraction_impact(
+    graph: TraceGraph,
+    node_id: str,
+    index: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+) -> List[ImpactEntry]:
+    """Everything that breaks if `node_id` turns out false, in BFS order with hop depth."""
+    node_id = node_id.upper()
+    index = impact_index(graph) if index is None else index
+    seen = {node_id}
+    queue = deque([(node_id, 0)])
+    entries: List[ImpactEntry] = []
+    while queue:
+        current, depth = queue.popleft()
+        for affected, kind in index.get(current, ()):
+            if affected in seen:
+                continue
+            seen.add(affected)
+            node = graph.nodes.get(affected)
+            entries.append(ImpactEntry(affected, node.section if node else None, depth + 1, kind, current))
+            queue.append((affected, depth + 1))
+    return entries
+
+
+def impact_of(session: Path, node_id: str) -> List[ImpactEntry]:
+    """Load `session` and return the retraction impact of `node_id`."""
+    return retraction_impact(load_graph(session), node_id)
+
+
+# --- Multi-session checking -----------------------------------------------------
+
+
+def discover_sessions(root: Path) -> List[Path]:
+    """`current-session.yaml` plus every archived session under `sessions/`."""
+    found = []
+    current = root / "current-session.yaml"
+    if current.exists():
+        found.append(current)
+    archive = root / "sessions"
+    if archive.is_dir():
+        found.extend(sorted(p for p in archive.rglob("*") if p.suffix in (".yaml", ".yml") and p.is_file()))
+    return found
+
+
+def summarize_session(path: str) -> Dict[str, Any]:
+    """Process-pool worker: local checks plus the data needed for a global ID index."""
+    started = time.perf_counter()
+    try:
+        graph = load_graph(Path(path))
+    except Exception as exc:  # a broken session must not abort the whole run
+        return {"path": path, "error": f"{type(exc).__name__}: {exc}", "parse_ms": 0.0, "check_ms": 0.0}
+    parsed = time.perf_counter()
+    unresolved = [
+        {"source": e.source, "target": e.target, "kind": e.kind}
+        for edges in graph.dangling_refs().values()
+        for e in edges
+    ]
+    summary = {
+        "path": path,
+        "session_id": graph.session.get("id"),
+        "defined": sorted(graph.nodes),
+        "duplicates": graph.duplicate_ids(),
+        "missing_sections": graph.missing_sections(),
+        "cycles": graph.find_cycles(),
+        "unresolved": unresolved,
+        "nodes": len(graph.nodes),
+        "edges": len(graph.edges),
+    }
+    summary["parse_ms"] = (parsed - started) * 1000
+    summary["check_ms"] = (time.perf_counter() - parsed) * 1000
+    return summary
+
+
+# --- Node validation ------------------------------------------------------------
+
+
+def node_hash(node: TraceNode) -> str:
+    canonical = json.dumps(node.fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def validate_node(graph: TraceGraph, node: TraceNode) -> List[Dict[str, str]]:
+    """Checks that depend only on the node and the nodes it references."""
+    issues: List[Dict[str, str]] = []
+    for edge in graph.out_edges(node.id):
+        target = graph.nodes.get(edge.target)
+        if target is None:
+            issues.append({"severity": "error", "code": "dangling", "ref": edge.target, "via": edge.kind})
+        elif (
+            edge.kind in DEPENDENCY_EDGES
+            and str(target.status).lower() in WITHDRAWN_STATUSES
+            and str(node.status).lower() not in WITHDRAWN_STATUSES
+        ):
+            issues.append({"severity": "warning", "code": "withdrawn-dependency", "ref": edge.target, "via": edge.kind})
+    for name in ("kind", "status"):
+        if name not in node.fields:
+            issues.append({"severity": "warning", "code": f"missing-{name}", "ref": "", "via": ""})
+    return issues
+
+
+@dataclass
+class NodeCheckResult:
+    issues: Dict[str, List[Dict[str, str]]]
+    hashes: Dict[str, str]
+    reused: int
+    rechecked: int
+
+
+def validate_nodes(graph: TraceGraph, cached: Optional[Dict[str, Any]] = None) -> NodeCheckResult:
+    """Validate every node, reusing cached results for nodes whose content and dependencies are unchanged.
+
+    A node is rechecked when its own hash changed, or when it transitively
+    references a node that was added, removed or changed since the cache
+    was written.
+    """
+    cached_nodes: Dict[str, Any] = (cached or {}).get("nodes", {})
+    hashes = {node_id: node_hash(node) for node_id, node in graph.nodes.items()}
+    changed = {i for i, h in hashes.items() if cached_nodes.get(i, {}).get("hash") != h}
+    changed |= set(cached_nodes) - set(hashes)
+    stale = graph.dependents(changed)
+    issues: Dict[str, List[Dict[str, str]]] = {}
+    rechecked = 0
+    for node_id, node in graph.nodes.items():
+        if node_id in stale:
+            issues[node_id] = validate_node(graph, node)
+            rechecked += 1
+        else:
+            issues[node_id] = cached_nodes[node_id]["issues"]
+    return NodeCheckResult(issues, hashes, len(graph.nodes) - rechecked, rechecked)
+
+
+def check_cache_path(root: Path, session: Path) -> Path:
+    try:
+        name = str(session.resolve().relative_to(root.resolve()))
+    except ValueError:
+        name = session.name
+    return root / "cache" / f"trace-check.{name.replace(os.sep, '__')}.json"
+
+
+def load_check_cache(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == CHECK_CACHE_VERSION else {}
+
+
+def save_check_cache(path: Path, result: NodeCheckResult) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nodes = {i: {"hash": h, "issues": result.issues[i]} for i, h in result.hashes.items()}
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"version": CHECK_CACHE_VERSION, "nodes": nodes}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,549 @@
+"""Hook handlers and the optional daemon behind trace-hook.py.
+
+trace-hook.py imports this module only when it has to handle a call
+itself: to `serve`, or when no daemon accepted the call (see
+trace_client.py for the forwarding protocol).
+
+Every call times its stages (read, parse, settings, append, session_check,
+emit, and count for Stop) and appends them to `events/hook-metrics.jsonl`;
+`trace-report.py --latency` summarizes them. Interpreter start-up is not
+included. When the elapsed time plus `hook_append_reserve_ms` would pass
+`hook_budget_ms`, the event log write is skipped and the skip is recorded.
+
+Payloads are decoded lazily: the bodies of `content`, `new_string` and
+`old_string` (multi-megabyte for large Writes) are never turned into Python
+strings. Each is scanned for trace IDs in place and replaced by a short
+`\x00rd-elided:<bytes>:<0|1>` sentinel before the rest is parsed.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import fnmatch
+import functools
+import json
+import os
+import re
+import signal
+import socket
+import socketserver
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+from trace_client import CLIENT_TIMEOUT_SECONDS, DAEMON_FAILED, DAEMON_OK, private_dir
+from trace_store import (
+    SESSION_FILE,
+    EventWriter,
+    append_metrics,
+    events_dir,
+    increment_counter,
+    load_settings,
+    numeric_setting,
+    prune_counters,
+    read_counter,
+    use_sqlite,
+)
+
+if TYPE_CHECKING:
+    from trace_session import SessionInfo, SessionLookup
+
+DESIGN_EXTENSIONS = {
+    ".tsx", ".jsx", ".vue", ".svelte", ".astro",
+    ".css", ".scss", ".sass", ".less",
+    ".html", ".mdx",
+}
+DESIGN_PATH_PATTERNS = [
+    r"/(design-system|tokens|theme|styles)/",
+    r"/(stories|storybook)/",
+]
+TRACE_ID_RE = re.compile(r"RD-(O|A|C|R|H|DD|AR|CR|RV|RT|BF)-\d+", re.I)
+# Case-sensitive search over lowercased bytes lets `re` use its fast literal-prefix scan.
+TRACE_ID_LOWER_RE = re.compile(TRACE_ID_RE.pattern.lower().encode("ascii"))
+# Keys whose string values are elided by decode_event; contains_trace_id reads the sentinel.
+ELIDED_KEYS = ("content", "new_string", "old_string")
+ELIDED_KEY_RE = re.compile(rb'"(' + b"|".join(k.encode("ascii") for k in ELIDED_KEYS) + rb')"\s*:\s*"')
+ELIDED_PREFIX = "\x00rd-elided:"
+ELIDE_CHUNK_BYTES = 1024 * 1024
+# One-shot hook processes write through; `serve` switches on group commit.
+WRITER = EventWriter()
+# Session headers for SessionStart (trace_session.SessionLookup), created on first use.
+SESSIONS: Optional["SessionLookup"] = None
+
+
+class StageTimer:
+    """Wall-clock milliseconds per stage of one hook call."""
+
+    def __init__(self, started: Optional[float] = None) -> None:
+        self.started = time.perf_counter() if started is None else started
+        self.stages: Dict[str, float] = {}
+        self.skipped_append = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+# The timer of the hook call being handled, so handlers keep their signature.
+CURRENT_TIMER: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar("CURRENT_TIMER", default=None)
+
+
+def stage(name: str) -> Any:
+    timer = CURRENT_TIMER.get()
+    return timer.stage(name) if timer is not None else contextlib.nullcontext()
+
+
+def over_budget(settings: Dict[str, Any]) -> bool:
+    timer = CURRENT_TIMER.get()
+    budget = numeric_setting(settings, "hook_budget_ms")
+    if timer is None or budget <= 0:
+        return False
+    return timer.elapsed_ms() + numeric_setting(settings, "hook_append_reserve_ms") > budget
+
+
+def scan_string(raw: bytes, start: int) -> Tuple[int, bool]:
+    """End of the JSON string body starting at `start` (-1 if unterminated), and whether it holds a trace ID.
+
+    Works in bounded chunks. Masking `\\\\` and then `\\"` with same-length
+    filler keeps offsets, so the first quote left is the closing one. The
+    trace-ID search stops at the first hit.
+    """
+    pos = start
+    hit = False
+    overlap = b""
+    while pos < len(raw):
+        chunk = raw[pos:pos + ELIDE_CHUNK_BYTES]
+        masked = chunk.replace(b"\\\\", b"__").replace(b'\\"', b"__")
+        quote = masked.find(b'"')
+        if not hit:
+            lowered = overlap + (chunk if quote < 0 else chunk[:quote]).lower()
+            hit = TRACE_ID_LOWER_RE.search(lowered) is not None
+            overlap = lowered[-16:]
+        if quote >= 0:
+            return pos + quote, hit
+        # A trailing lone backslash escapes the first byte of the next chunk.
+        step = len(chunk) - (1 if masked.endswith(b"\\") else 0)
+        if step == 0:
+            break
+        pos += step
+    return -1, hit
+
+
+def elide_bodies(raw: bytes) -> bytes:
+    """Replace large string bodies with sentinels that record their size and trace-ID hit."""
+    pieces = []
+    pos = 0
+    while True:
+        match = ELIDED_KEY_RE.search(raw, pos)
+        if match is None:
+            break
+        start = match.end()
+        end, hit = scan_string(raw, start)
+        if end < 0:
+            break
+        pieces.append(raw[pos:start])
+        pieces.append(f"\\u0000rd-elided:{end - start}:{int(hit)}".encode("ascii"))
+        pos = end
+    if not pieces:
+        return raw
+    pieces.append(raw[pos:])
+    return b"".join(pieces)
+
+
+def parse_input(raw: bytes) -> Dict[str, Any]:
+    if not raw.strip():
+        return {}
+    try:
+        return json.loads(elide_bodies(raw).decode("utf-8", errors="replace"))
+    except ValueError:
+        return {"_raw_stdin_unparsed": raw[:1000].decode("utf-8", errors="replace")}
+
+
+def emit(obj: Optional[Dict[str, Any]]) -> None:
+    if obj:
+        print(json.dumps(obj, ensure_ascii=False))
+
+
+@functools.lru_cache(maxsize=64)
+def trace_root(cwd: Path) -> Path:
+    return cwd / ".relational-design"
+
+
+def session_info(root: Path) -> "SessionInfo":
+    """The session header; parsed only for SessionStart, memoized by stat in the daemon."""
+    global SESSIONS
+    with stage("session_check"):
+        if SESSIONS is None:
+            from trace_session import SessionLookup
+
+            SESSIONS = SessionLookup()
+        return SESSIONS.get(root)
+
+
+def active_session_exists(root: Path) -> bool:
+    with stage("session_check"):
+        return os.path.exists(root / SESSION_FILE)
+
+
+def get_file_path(event: Dict[str, Any]) -> str:
+    tool_input = event.get("tool_input") or {}
+    return str(tool_input.get("file_path") or tool_input.get("path") or "")
+
+
+class DesignFileClassifier:
+    """Suffix set plus one precompiled alternation regex, memoized per path.
+
+    `extra_globs` come from the `design_globs` setting and match a path
+    suffix starting at a `/` boundary, e.g. `tokens/*.json` or `*.figma.json`.
+    """
+
+    def __init__(self, extra_globs: Tuple[str, ...] = ()) -> None:
+        patterns = [f"(?:{p})" for p in DESIGN_PATH_PATTERNS]
+        patterns += [f"(?:^|/){fnmatch.translate(g)}" for g in extra_globs]
+        self._path_re = re.compile("|".join(patterns))
+        self.classify = functools.lru_cache(maxsize=4096)(self._classify)
+
+    def _classify(self, path: str) -> bool:
+        if not path:
+            return False
+        normalized = path.replace("\\", "/")
+        dot = normalized.rfind(".")
+        if dot > normalized.rfind("/") + 1 and normalized[dot:].lower() in DESIGN_EXTENSIONS:
+            return True
+        return self._path_re.search(normalized) is not None
+
+
+@functools.lru_cache(maxsize=8)
+def design_classifier(extra_globs: Tuple[str, ...] = ()) -> DesignFileClassifier:
+    return DesignFileClassifier(extra_globs)
+
+
+def design_globs(settings: Dict[str, Any]) -> Tuple[str, ...]:
+    globs = settings.get("design_globs") or ()
+    if isinstance(globs, str):
+        globs = [globs]
+    return tuple(str(g) for g in globs)
+
+
+def is_design_file(path: str, extra_globs: Tuple[str, ...] = ()) -> bool:
+    return design_classifier(extra_globs).classify(path)
+
+
+def contains_trace_id(event: Dict[str, Any]) -> bool:
+    tool_input = event.get("tool_input") or {}
+    for key in ("content", "new_string", "old_string"):
+        value = tool_input.get(key)
+        if not isinstance(value, str):
+            continue
+        if value.startswith(ELIDED_PREFIX):
+            if value.endswith(":1"):
+                return True
+        elif TRACE_ID_RE.search(value):
+            return True
+    return False
+
+
+def safe_event_record(event: Dict[str, Any], phase: str, extra_globs: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    path = get_file_path(event)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "phase": phase,
+        "hook_event_name": event.get("hook_event_name"),
+        "session_id": event.get("session_id"),
+        "cwd": event.get("cwd"),
+        "tool_name": event.get("tool_name"),
+        "tool_use_id": event.get("tool_use_id"),
+        "file_path": path,
+        "is_design_file": is_design_file(path, extra_globs),
+        "has_inline_trace_id": contains_trace_id(event),
+        "agent_type": event.get("agent_type"),
+    }
+
+
+def append_log(root: Path, event: Dict[str, Any], phase: str, settings: Dict[str, Any]) -> None:
+    if over_budget(settings):
+        CURRENT_TIMER.get().skipped_append = True
+        return
+    try:
+        with stage("append"):
+            line = json.dumps(safe_event_record(event, phase, design_globs(settings)), ensure_ascii=False)
+            WRITER.append(root, line, settings)
+    except Exception:
+        # Hooks should not fail the user's work because logging failed.
+        pass
+
+
+def advisory_context(path: str, active: bool) -> str:
+    if active:
+        return (
+            f"Relational Design: You are editing a design-related file ({path}). "
+            "Keep non-trivial visual, layout, copy, or interaction choices linked to the active trace session."
+        )
+    return (
+        f"Relational Design: You are editing a design-related file ({path}) without an active trace session. "
+        "Before finalizing, create .relational-design/current-session.yaml or ask trace-archivist to record observations, relations, hypotheses, decisions, and critiques."
+    )
+
+
+def handle_pre_tool_use(event: Dict[str, Any], root: Path, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    append_log(root, event, "pre-tool-use", settings)
+
+    path = get_file_path(event)
+    if not is_design_file(path, design_globs(settings)):
+        return None
+
+    active = active_session_exists(root)
+
+    return {
+        "hookSpecificOutput": {
+            "hookEventName": "PreToolUse",
+            "additionalContext": advisory_context(path, active)
+        }
+    }
+
+
+def handle_post_tool_use(event: Dict[str, Any], root: Path, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    append_log(root, event, "post-tool-use", settings)
+    session_id = event.get("session_id")
+    if session_id and is_design_file(get_file_path(event), design_globs(settings)):
+        # Keeps Stop an O(1) per-session lookup instead of a log scan.
+        with stage("count"):
+            try:
+                increment_counter(root, str(session_id))
+            except OSError:
+                pass
+    return None
+
+
+def handle_subagent_stop(event: Dict[str, Any], root: Path, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    append_log(root, event, "subagent-stop", settings)
+    agent = event.get("agent_type", "Relational Design agent")
+    return {
+        "systemMessage": (
+            f"Relational Design role boundary check for {agent}: confirm observed facts, assumptions, "
+            "relations, hypotheses, decisions, artifacts, critiques, and retractions were kept as separate "
+            "node types, and that this agent did not exceed its role."
+        )
+    }
+
+
+def handle_session_start(event: Dict[str, Any], root: Path, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    append_log(root, event, "session-start", settings)
+    prune_counters(root)
+    # Keep SessionStart quiet unless a trace session already exists.
+    session = session_info(root)
+    if session.exists:
+        return {
+            "hookSpecificOutput": {
+                "hookEventName": "SessionStart",
+                "additionalContext": (
+                    f"Relational Design active session {session.describe()} found at {session.path}. "
+                    "Continue preserving design trace dependencies."
+                )
+            }
+        }
+    return None
+
+
+def count_design_edits(root: Path, window: int = 200, settings: Optional[Dict[str, Any]] = None) -> int:
+    """Design edits among the last `window` events of any session; Stop's fallback without a session_id."""
+    if settings and use_sqlite(settings):
+        try:
+            from trace_db import count_recent_design_edits
+
+            return count_recent_design_edits(root, window)
+        except Exception:
+            return 0
+    directory = events_dir(root)
+    if not directory.exists():
+        return 0
+    from trace_segments import tail_records
+
+    count = 0
+    try:
+        for line in tail_records(directory, window):
+            try:
+                item = json.loads(line)
+            except Exception:
+                continue
+            if item.get("phase") == "post-tool-use" and item.get("is_design_file"):
+                count += 1
+    except Exception:
+        pass
+    return count
+
+
+def handle_stop(event: Dict[str, Any], root: Path, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    append_log(root, event, "stop", settings)
+    with stage("append"):
+        WRITER.flush()
+    session_id = event.get("session_id")
+    with stage("count"):
+        if session_id:
+            edits = read_counter(root, str(session_id))
+        else:
+            edits = count_design_edits(root, settings=settings)
+    active = active_session_exists(root)
+
+    if edits and not active:
+        scope = "in this session" if session_id else "recently"
+        message = (
+            f"Relational Design detected {edits} design-related edit(s) {scope}, but no active trace session exists at "
+            f"{root / SESSION_FILE}. Create or update the trace record before treating the design as finalized."
+        )
+        return {"systemMessage": message}
+    return None
+
+
+HANDLERS = {
+    "session-start": handle_session_start,
+    "pre-tool-use": handle_pre_tool_use,
+    "post-tool-use": handle_post_tool_use,
+    "subagent-stop": handle_subagent_stop,
+    "stop": handle_stop,
+}
+
+
+def record_metrics(root: Path, phase: str, timer: StageTimer, settings: Dict[str, Any], daemon: bool) -> None:
+    if not settings.get("hook_metrics"):
+        return
+    try:
+        append_metrics(root, {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "phase": phase,
+            "daemon": daemon,
+            "total_ms": round(timer.elapsed_ms(), 3),
+            "stages": {k: round(v, 3) for k, v in timer.stages.items()},
+            "skipped_append": timer.skipped_append,
+        })
+    except OSError:
+        pass
+
+
+def run_hook(
+    phase: str,
+    raw: bytes,
+    cwd: str,
+    timer: StageTimer,
+    respond: Callable[[Optional[Dict[str, Any]]], None],
+    daemon: bool = False,
+) -> None:
+    """Parse, handle, emit, then record timings. `cwd` is used when the event has none."""
+    token = CURRENT_TIMER.set(timer)
+    try:
+        with timer.stage("parse"):
+            event = parse_input(raw)
+        with timer.stage("settings"):
+            root = trace_root(Path(event.get("cwd") or cwd))
+            settings = load_settings(root.parent)
+        reply = HANDLERS[phase](event, root, settings)
+        with timer.stage("emit"):
+            respond(reply)
+    finally:
+        CURRENT_TIMER.reset(token)
+    record_metrics(root, phase, timer, settings, daemon)
+
+
+class HookRequestHandler(socketserver.StreamRequestHandler):
+    """One connection = one hook call: a header line, the cwd, then the raw stdin payload."""
+
+    timeout = CLIENT_TIMEOUT_SECONDS
+
+    def handle(self) -> None:
+        try:
+            phase, cwd_length, elapsed_ms, startup_ms, read_ms = self.rfile.readline().decode("ascii").split()
+            if phase not in HANDLERS:
+                raise ValueError(f"unknown phase: {phase!r}")
+            cwd = os.fsdecode(self.rfile.read(int(cwd_length)))
+            # Continue the client's clock, so the budget and metrics cover its start-up too.
+            timer = StageTimer(time.perf_counter() - float(elapsed_ms) / 1000)
+            timer.stages["startup"] = float(startup_ms)
+            timer.stages["read"] = float(read_ms)
+            with timer.stage("read"):
+                raw = self.rfile.read()
+        except Exception:
+            # Nothing has been handled yet, so the client may run the hook itself.
+            self.send(DAEMON_FAILED)
+            return
+        self.reply: Optional[Dict[str, Any]] = None
+        try:
+            run_hook(phase, raw, cwd or os.getcwd(), timer, self.respond, daemon=True)
+        except Exception:
+            # The event may already be logged: report success without output
+            # rather than have the client handle the call a second time.
+            self.reply = None
+        frame = DAEMON_OK
+        if self.reply:
+            frame += json.dumps(self.reply, ensure_ascii=False).encode("utf-8")
+        self.send(frame)
+
+    def respond(self, reply: Optional[Dict[str, Any]]) -> None:
+        # Held until the call has finished, so a failure after this point drops the output too.
+        self.reply = reply
+
+    def send(self, frame: bytes) -> None:
+        try:
+            self.wfile.write(frame)
+        except OSError:
+            pass
+
+
+def serve(socket_path: str) -> int:
+    directory = os.path.dirname(socket_path) or "."
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    except OSError as exc:
+        print(f"cannot create {directory}: {exc}", file=sys.stderr)
+        return 1
+    if not private_dir(directory):
+        print(
+            f"refusing to serve: {directory} must be owned by you and not writable by others",
+            file=sys.stderr,
+        )
+        return 1
+    if os.path.lexists(socket_path):
+        # Refuse to steal a live socket; remove a stale one left by a crashed daemon.
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"relational-design hook daemon already running at {socket_path}", file=sys.stderr)
+            return 1
+        except OSError:
+            os.unlink(socket_path)
+        finally:
+            probe.close()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    global WRITER
+    WRITER = EventWriter(group_commit=True)
+    # The socket is created 0600 by bind itself; a chmod afterwards would leave a window.
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, HookRequestHandler)
+    finally:
+        os.umask(umask)
+    with server:
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            WRITER.flush()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(socket_path)
+    return 0
+
+
+def run_in_process(phase: str, raw: bytes, started: float, stages: Dict[str, float]) -> None:
+    """Handle a call no daemon accepted; timings start at the top of trace-hook.py."""
+    timer = StageTimer(started)
+    timer.stages.update(stages)
+    run_hook(phase, raw, os.getcwd(), timer, emit)
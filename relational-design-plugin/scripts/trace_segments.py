@@ -0,0 +1,342 @@
+"""Sealed event segments: reading, summarizing and sealing.
+
+The hook's append path (`trace_store.write_records`) only detaches a full
+active segment; sealing it, and every reader of sealed segments, lives
+here so a hook call does not load gzip, hashlib or the summary code.
+
+A writer that dies while sealing leaves a `.sealing-<pid>-*` file (raw,
+half compressed or compressed) or a numbered segment missing from the
+manifest. Readers never see either, so every seal first finishes what a
+dead writer left behind.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from trace_store import (
+    ACTIVE_LOG,
+    SEALING_PREFIX,
+    append_lock,
+    detach_active,
+    read_manifest,
+    sealing_name,
+    write_manifest,
+)
+
+SEGMENT_NAME_RE = re.compile(r"hook-events\.(\d{6})\.jsonl(?:\.gz|\.zst)?$")
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+# Where a process cannot be probed for liveness, a sealing file this old is taken as abandoned.
+STALE_SEALING_SECONDS = 3600
+
+
+def summarize(lines: Iterable[bytes], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Aggregate event lines into the counts the report and Stop hook need.
+
+    Passing a previous summary as `base` continues it, so a checkpointed
+    aggregate can be extended with newly appended lines.
+    """
+    base = base or {}
+    events = base.get("events", 0)
+    first_ts: Optional[str] = base.get("first_ts")
+    last_ts: Optional[str] = base.get("last_ts")
+    by_phase: Counter = Counter(base.get("by_phase", {}))
+    design_files: Counter = Counter(base.get("design_files", {}))
+    for line in lines:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        events += 1
+        timestamp = item.get("timestamp")
+        if timestamp:
+            first_ts = first_ts or timestamp
+            last_ts = timestamp
+        phase = item.get("phase", "unknown")
+        by_phase[phase] += 1
+        if phase == "post-tool-use" and item.get("is_design_file") and item.get("file_path"):
+            design_files[item["file_path"]] += 1
+    return {
+        "events": events,
+        "first_ts": first_ts,
+        "last_ts": last_ts,
+        "by_phase": dict(by_phase),
+        "design_files": dict(design_files),
+    }
+
+
+def summarize_file(path: Path, offset: int = 0, base: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], int]:
+    """Summarize `path` from byte `offset`; returns the summary and the offset just past the last whole line.
+
+    A trailing partial line (a write still in progress) is left for the next call.
+    """
+    consumed = offset
+
+    def complete_lines(f: Any) -> Iterator[bytes]:
+        nonlocal consumed
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            consumed += len(line)
+            if line.strip():
+                yield line
+
+    with path.open("rb") as f:
+        f.seek(offset)
+        summary = summarize(complete_lines(f), base)
+    return summary, consumed
+
+
+def open_segment(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        import zstandard  # type: ignore
+
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(path.open("rb")))
+    return path.open("rb")
+
+
+def iter_segment_lines(path: Path) -> Iterator[bytes]:
+    with open_segment(path) as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def sealed_segments(directory: Path) -> List[Dict[str, Any]]:
+    return [s for s in read_manifest(directory)["segments"] if (directory / s["name"]).exists()]
+
+
+def iter_lines(directory: Path) -> Iterator[bytes]:
+    """Yield every event line, oldest first, across sealed segments and the active log."""
+    for segment in sealed_segments(directory):
+        yield from iter_segment_lines(directory / segment["name"])
+    active = directory / ACTIVE_LOG
+    if active.exists():
+        yield from iter_segment_lines(active)
+
+
+def tail_lines(path: Path, limit: int, block_size: int = 8192) -> List[bytes]:
+    """Return the last `limit` lines of `path`, reading backwards from the end in blocks."""
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b""
+        # One extra newline is needed so the oldest returned line is complete.
+        while position > 0 and buffer.count(b"\n") <= limit:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+    lines = buffer.splitlines()
+    if position > 0:
+        lines = lines[1:]
+    return lines[-limit:]
+
+
+def tail_records(directory: Path, limit: int) -> List[bytes]:
+    """Last `limit` event lines, continuing into sealed segments if the active log is short."""
+    active = directory / ACTIVE_LOG
+    lines = tail_lines(active, limit) if active.exists() else []
+    for segment in reversed(sealed_segments(directory)):
+        if len(lines) >= limit:
+            break
+        older = list(iter_segment_lines(directory / segment["name"]))
+        lines = older[-(limit - len(lines)):] + lines
+    return lines
+
+
+def compress_segment(path: Path, method: str) -> Path:
+    if method == "zstd":
+        try:
+            import zstandard  # type: ignore
+        except ModuleNotFoundError:
+            method = "gzip"
+        else:
+            target = path.with_name(path.name + ".zst")
+            with path.open("rb") as src, target.open("wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+            path.unlink()
+            return target
+    if method == "gzip":
+        target = path.with_name(path.name + ".gz")
+        with path.open("rb") as src, gzip.open(target, "wb") as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        path.unlink()
+        return target
+    return path
+
+
+def summarize_segment(path: Path) -> Tuple[Dict[str, Any], int]:
+    """Summary of a (possibly compressed) segment and its uncompressed size in bytes."""
+    size = 0
+
+    def counted() -> Iterator[bytes]:
+        nonlocal size
+        for line in iter_segment_lines(path):
+            size += len(line)
+            yield line
+
+    summary = summarize(counted())
+    return summary, size
+
+
+def jsonl_suffix(path: Path) -> str:
+    """`.jsonl` plus any compression suffix: `.sealing-1-2.jsonl.gz` -> `.jsonl.gz`."""
+    return path.name[path.name.index(".jsonl"):]
+
+
+def register_orphans(directory: Path, manifest: Dict[str, Any]) -> None:
+    """List numbered segments that were renamed into place but never made it into the manifest.
+
+    Called with the append lock held, before a new sequence number is taken,
+    so an orphan is never overwritten by the next seal.
+    """
+    listed = {segment["name"] for segment in manifest["segments"]}
+    orphans = []
+    for entry in os.scandir(directory):
+        match = SEGMENT_NAME_RE.match(entry.name)
+        if match and entry.name not in listed:
+            orphans.append((int(match.group(1)), entry.name))
+    for seq, name in sorted(orphans):
+        summary, size = summarize_segment(directory / name)
+        manifest["segments"].append({"name": name, "seq": seq, "bytes": size, **summary})
+        manifest["next_seq"] = max(manifest["next_seq"], seq + 1)
+    if orphans:
+        manifest["segments"].sort(key=lambda segment: segment["seq"])
+
+
+def owner_gone(path: Path) -> bool:
+    """Whether the process that detached this sealing file is no longer running."""
+    pid_text = path.name[len(SEALING_PREFIX):].split("-", 1)[0].split(".", 1)[0]
+    try:
+        pid = int(pid_text)
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        return False
+    if os.name == "posix":
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+    try:
+        return time.time() - path.stat().st_mtime > STALE_SEALING_SECONDS
+    except OSError:
+        return False
+
+
+def claim(path: Path) -> Optional[Path]:
+    """Take over a sealing file under this process's name; None if another process took it first."""
+    claimed = path.with_name(sealing_name(jsonl_suffix(path)))
+    try:
+        os.replace(path, claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def abandoned_sealing(directory: Path) -> List[Path]:
+    """Sealing files of dead writers, oldest first, claimed by this process.
+
+    A raw file with a compressed twin was being compressed when its writer
+    died: the partial output is dropped and the raw file sealed again.
+    """
+    groups: Dict[str, List[Path]] = {}
+    for entry in os.scandir(directory):
+        if entry.name.startswith(SEALING_PREFIX) and ".jsonl" in entry.name:
+            path = Path(entry.path)
+            groups.setdefault(path.name[:path.name.index(".jsonl")], []).append(path)
+    leftovers = []
+    for paths in groups.values():
+        raw = [path for path in paths if path.name.endswith(".jsonl")]
+        source = raw[0] if raw else paths[0]
+        if not owner_gone(source):
+            continue
+        try:
+            mtime = source.stat().st_mtime
+        except OSError:
+            continue
+        claimed = claim(source)
+        if claimed is None:
+            continue
+        for partial in paths:
+            if partial != source:
+                partial.unlink(missing_ok=True)
+        leftovers.append((mtime, claimed))
+    return [path for _, path in sorted(leftovers)]
+
+
+def seal_one(directory: Path, sealing: Path, settings: Dict[str, Any]) -> Path:
+    summary, size = summarize_segment(sealing)
+    if sealing.suffix in COMPRESSED_SUFFIXES:
+        compressed = sealing
+    else:
+        compressed = compress_segment(sealing, str(settings.get("event_segment_compression") or "none"))
+    with append_lock(directory):
+        manifest = read_manifest(directory)
+        register_orphans(directory, manifest)
+        seq = manifest["next_seq"]
+        sealed = directory / (f"hook-events.{seq:06d}" + jsonl_suffix(compressed))
+        os.replace(compressed, sealed)
+        manifest["next_seq"] = seq + 1
+        manifest["segments"].append({"name": sealed.name, "seq": seq, "bytes": size, **summary})
+        write_manifest(directory, manifest)
+    return sealed
+
+
+def seal(directory: Path, sealing: Path, settings: Dict[str, Any]) -> Path:
+    """Summarize and compress a detached segment, then number it and list it in the manifest.
+
+    Segments abandoned by writers that died mid-seal are sealed first, so
+    sequence numbers stay in event order. Only the manifest update takes
+    the append lock; compression runs outside it so concurrent writers are
+    not held up.
+    """
+    for leftover in abandoned_sealing(directory):
+        try:
+            seal_one(directory, leftover, settings)
+        except (OSError, EOFError):
+            # A truncated leftover must not block sealing the current segment.
+            continue
+    return seal_one(directory, sealing, settings)
+
+
+def rotate(directory: Path, settings: Dict[str, Any]) -> Optional[Path]:
+    """Seal the active segment. Returns the sealed path, or None if another writer got there first."""
+    with append_lock(directory):
+        sealing = detach_active(directory)
+    if sealing is None:
+        return None
+    return seal(directory, sealing, settings)
+
+
+def active_identity(directory: Path, stat: os.stat_result) -> Dict[str, Any]:
+    """What a saved offset into the active segment is valid for.
+
+    Rotation unlinks the sealed file, so the next active segment can reuse
+    its inode. The manifest's next_seq (advanced by every seal) and a digest
+    of the first line tell those files apart.
+    """
+    try:
+        with (directory / ACTIVE_LOG).open("rb") as f:
+            head = hashlib.sha1(f.readline(64 * 1024)).hexdigest()
+    except OSError:
+        head = None
+    return {"inode": stat.st_ino, "next_seq": read_manifest(directory).get("next_seq"), "head": head}
@@ -0,0 +1,89 @@
+"""Active trace session header for the SessionStart hook.
+
+The hooks check whether `.relational-design/current-session.yaml` exists
+with a single `stat` (trace_handlers.active_session_exists). Only
+SessionStart names the session, so only it imports this module and reads
+the `trace_session` header (id, status, mode, title). `SessionLookup`
+memoizes the header per root, keyed by the file's inode, mtime_ns and size,
+so the daemon re-reads it only after the file changes.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from trace_store import SESSION_FILE
+
+HEADER_KEYS = ("id", "status", "mode", "title")
+
+
+class SessionInfo:
+    __slots__ = ("exists", "path", "id", "status", "mode", "title")
+
+    def __init__(self, exists: bool, path: str) -> None:
+        self.exists = exists
+        self.path = path
+        self.id: Optional[str] = None
+        self.status: Optional[str] = None
+        self.mode: Optional[str] = None
+        self.title: Optional[str] = None
+
+    def describe(self) -> str:
+        """`RD-S-0001 (status: active, mode: standard)`, leaving out what is unknown."""
+        details = [f"{k}: {getattr(self, k)}" for k in ("status", "mode") if getattr(self, k)]
+        label = self.id or "session"
+        return f"{label} ({', '.join(details)})" if details else label
+
+
+def parse_session_header(path: Path) -> SessionInfo:
+    """Read only the top-level `trace_session:` mapping; node sections are never parsed."""
+    info = SessionInfo(exists=True, path=str(path))
+    in_header = False
+    with path.open(encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if not line[0].isspace():
+                if in_header:
+                    break
+                in_header = stripped == "trace_session:"
+                continue
+            if not in_header:
+                continue
+            key, sep, value = stripped.partition(":")
+            if sep and key in HEADER_KEYS:
+                value = value.split(" #", 1)[0].strip()
+                if len(value) >= 2 and value[0] in "'\"" and value[-1] == value[0]:
+                    value = value[1:-1]
+                setattr(info, key, value or None)
+    return info
+
+
+def file_identity(stat: os.stat_result) -> List[int]:
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+class SessionLookup:
+    """Session header per trace root, re-read only when the file's stat changes."""
+
+    def __init__(self) -> None:
+        self._memo: Dict[Path, Tuple[List[int], SessionInfo]] = {}
+
+    def get(self, root: Path) -> SessionInfo:
+        path = root / SESSION_FILE
+        try:
+            identity = file_identity(path.stat())
+        except OSError:
+            self._memo.pop(root, None)
+            return SessionInfo(exists=False, path=str(path))
+        memo = self._memo.get(root)
+        if memo is not None and memo[0] == identity:
+            return memo[1]
+        try:
+            info = parse_session_header(path)
+        except OSError:
+            info = SessionInfo(exists=True, path=str(path))
+        self._memo[root] = (identity, info)
+        return info
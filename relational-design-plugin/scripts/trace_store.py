@@ -0,0 +1,366 @@
+"""Event log storage shared by the Relational Design hook and report scripts.
+
+Hook events are appended to `.relational-design/events/hook-events.jsonl`
+(the active segment). When the active segment grows past a size or age
+limit it is sealed: renamed to `hook-events.NNNNNN.jsonl`, optionally
+compressed, summarized, and listed in `events/manifest.json`. Readers use
+the per-segment summaries instead of rescanning sealed segments. With
+`event_backend: sqlite` records go to the SQLite store in `trace_db.py`.
+
+This module is the hook's append path and imports little beyond os and
+json. Sealing and reading segments live in `trace_segments.py`, the
+report's columnar cache in `trace_columns.py`.
+
+Plugin settings are read from the YAML frontmatter of
+`.claude/relational-design-plugin.local.md` in the project directory.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ModuleNotFoundError:  # Windows: no advisory locks, plain O_APPEND only.
+    fcntl = None  # type: ignore[assignment]
+
+EVENTS_DIR = "events"
+# The active trace session, relative to the trace root.
+SESSION_FILE = "current-session.yaml"
+ACTIVE_LOG = "hook-events.jsonl"
+MANIFEST = "manifest.json"
+# Never renamed, so a writer waiting on it cannot end up holding a sealed segment.
+APPEND_LOCK = ".append.lock"
+# A detached segment between rename and its manifest entry (see trace_segments.seal).
+SEALING_PREFIX = ".sealing-"
+METRICS_LOG = "hook-metrics.jsonl"
+# Per-session design-edit counters: one byte appended per edit, count = file size.
+COUNTERS_DIR = "counters"
+COUNTER_MAX_AGE_DAYS = 30
+# The metrics log keeps one previous generation (`hook-metrics.jsonl.1`).
+METRICS_MAX_BYTES = 4 * 1024 * 1024
+SETTINGS_FILE = Path(".claude") / "relational-design-plugin.local.md"
+
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    "event_segment_max_bytes": 8 * 1024 * 1024,
+    # 0 disables age-based rotation.
+    "event_segment_max_age_hours": 0,
+    # gzip | zstd | none. zstd needs the optional `zstandard` package.
+    "event_segment_compression": "gzip",
+    # Group-commit window for the hook daemon; 0 writes every record through.
+    "event_group_commit_ms": 0,
+    # jsonl | sqlite (events/hook-events.sqlite, see trace_db.py).
+    "event_backend": "jsonl",
+    # Per-stage hook timings go to events/hook-metrics.jsonl. Off by default:
+    # it is a second append on every call.
+    "hook_metrics": False,
+    # The hook skips its log write once elapsed + reserve would pass the
+    # budget; 0 disables the check. hooks.json kills a hook at 5 s.
+    "hook_budget_ms": 2000,
+    "hook_append_reserve_ms": 100,
+}
+
+
+def parse_scalar(value: str) -> Any:
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    if value.startswith("[") and value.endswith("]"):
+        return [parse_scalar(item) for item in value[1:-1].split(",") if item.strip()]
+    if value[0] in "'\"" and value[-1] == value[0]:
+        return value[1:-1]
+    return value
+
+
+def parse_frontmatter(text: str) -> Dict[str, Any]:
+    """Parse the flat `key: value` / `key:` + `- item` subset of YAML frontmatter."""
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != "---":
+        return {}
+    data: Dict[str, Any] = {}
+    last_key: Optional[str] = None
+    for line in lines[1:]:
+        stripped = line.strip()
+        if stripped == "---":
+            break
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and last_key is not None:
+            if not isinstance(data.get(last_key), list):
+                data[last_key] = []
+            data[last_key].append(parse_scalar(stripped[2:]))
+            continue
+        key, sep, value = stripped.partition(":")
+        if not sep:
+            continue
+        last_key = key.strip()
+        data[last_key] = parse_scalar(value)
+    return data
+
+
+def load_settings(project_dir: Path) -> Dict[str, Any]:
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        text = (project_dir / SETTINGS_FILE).read_text(encoding="utf-8")
+    except OSError:
+        return settings
+    settings.update({k: v for k, v in parse_frontmatter(text).items() if v is not None})
+    return settings
+
+
+def numeric_setting(settings: Dict[str, Any], key: str) -> float:
+    """A numeric setting; a malformed or non-finite value (e.g. `2s`, `.nan`) falls back to the default."""
+    try:
+        value = float(settings.get(key) or 0)
+    except (TypeError, ValueError):
+        value = math.nan
+    return value if math.isfinite(value) else float(DEFAULT_SETTINGS.get(key) or 0)
+
+
+def events_dir(root: Path) -> Path:
+    return root / EVENTS_DIR
+
+
+def read_manifest(directory: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((directory / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"version": 1, "next_seq": 1, "segments": []}
+
+
+def write_manifest(directory: Path, manifest: Dict[str, Any]) -> None:
+    tmp = directory / f".{MANIFEST}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, directory / MANIFEST)
+
+
+def segment_age_hours(path: Path) -> float:
+    with path.open("rb") as f:
+        first = f.readline()
+    try:
+        started = datetime.fromisoformat(json.loads(first)["timestamp"])
+    except (ValueError, KeyError, TypeError):
+        return 0.0
+    return (time.time() - started.timestamp()) / 3600
+
+
+def should_rotate(active: Path, size: int, settings: Dict[str, Any]) -> bool:
+    max_bytes = numeric_setting(settings, "event_segment_max_bytes")
+    if max_bytes > 0 and size >= max_bytes:
+        return True
+    max_age = numeric_setting(settings, "event_segment_max_age_hours")
+    return max_age > 0 and segment_age_hours(active) >= max_age
+
+
+def open_in(directory: Path, name: str, flags: int) -> int:
+    """os.open inside `directory`, creating the directory only if the first open fails."""
+    try:
+        return os.open(directory / name, flags, 0o644)
+    except FileNotFoundError:
+        directory.mkdir(parents=True, exist_ok=True)
+        return os.open(directory / name, flags, 0o644)
+
+
+@contextlib.contextmanager
+def append_lock(directory: Path) -> Iterator[None]:
+    """Hold an exclusive flock on `events/.append.lock` (a no-op where flock is unsupported)."""
+    if fcntl is None:
+        yield
+        return
+    fd = open_in(directory, APPEND_LOCK, os.O_RDWR | os.O_CREAT)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        os.close(fd)
+
+
+def sealing_name(suffix: str = ".jsonl") -> str:
+    """A fresh `.sealing-<pid>-<ns>` name; the pid lets a later rotation tell whether its owner died."""
+    return f"{SEALING_PREFIX}{os.getpid()}-{time.time_ns()}{suffix}"
+
+
+def detach_active(directory: Path) -> Optional[Path]:
+    """Rename the active segment to a per-process name; None if another writer got there first."""
+    sealing = directory / sealing_name()
+    try:
+        os.replace(directory / ACTIVE_LOG, sealing)
+    except FileNotFoundError:
+        return None
+    return sealing
+
+
+def use_sqlite(settings: Dict[str, Any]) -> bool:
+    return settings.get("event_backend") == "sqlite"
+
+
+def write_records(root: Path, records: List[bytes], settings: Dict[str, Any]) -> None:
+    """Append encoded lines with one O_APPEND write; mkdir only if the open fails.
+
+    The write, the size check and detaching a full segment happen under the
+    append lock, so a record is never split by another writer (even after a
+    short write) and never lands in a segment that is already being sealed.
+    """
+    if use_sqlite(settings):
+        # Imported lazily so JSONL users never pay for loading sqlite3.
+        from trace_db import insert_lines
+
+        insert_lines(root, records)
+        return
+    directory = events_dir(root)
+    active = directory / ACTIVE_LOG
+    sealing = None
+    with append_lock(directory):
+        fd = open_in(directory, ACTIVE_LOG, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            data = memoryview(b"".join(records))
+            while data:
+                data = data[os.write(fd, data):]
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if should_rotate(active, size, settings):
+            sealing = detach_active(directory)
+    if sealing is not None:
+        from trace_segments import seal
+
+        seal(directory, sealing, settings)
+
+
+def append_line(root: Path, line: str, settings: Dict[str, Any]) -> None:
+    write_records(root, [(line + "\n").encode("utf-8")], settings)
+
+
+class EventWriter:
+    """Event appender with an opt-in group-commit mode for long-lived processes.
+
+    With group commit enabled and `event_group_commit_ms` > 0, records are
+    buffered per trace root and written together once the window elapses or
+    `flush()` is called. Otherwise every record is written through.
+    """
+
+    def __init__(self, group_commit: bool = False) -> None:
+        self.group_commit = group_commit
+        self._pending: Dict[Path, List[bytes]] = {}
+        self._settings: Dict[Path, Dict[str, Any]] = {}
+        self._timer: Optional[Any] = None
+        if group_commit:
+            # Only the daemon buffers; one-shot hooks never load threading.
+            import threading
+
+            self._threading = threading
+            self._lock = threading.Lock()
+            self._write_lock = threading.Lock()
+
+    def append(self, root: Path, line: str, settings: Dict[str, Any]) -> None:
+        window_ms = numeric_setting(settings, "event_group_commit_ms")
+        if not self.group_commit or window_ms <= 0:
+            append_line(root, line, settings)
+            return
+        with self._lock:
+            self._pending.setdefault(root, []).append((line + "\n").encode("utf-8"))
+            self._settings[root] = settings
+            if self._timer is None:
+                self._timer = self._threading.Timer(window_ms / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        if not self.group_commit:
+            return
+        # The write lock keeps a timer flush and an explicit flush from reordering records.
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                settings, self._settings = self._settings, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            for root, records in pending.items():
+                try:
+                    write_records(root, records, settings[root])
+                except Exception:
+                    # Logging must never fail the hook (OSError, or sqlite3.Error with the SQLite backend).
+                    pass
+
+
+def append_metrics(root: Path, record: Dict[str, Any]) -> None:
+    """Append one hook timing record, rolling the file over at METRICS_MAX_BYTES."""
+    path = events_dir(root) / METRICS_LOG
+    data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    try:
+        fd = os.open(path, flags, 0o644)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, flags, 0o644)
+    try:
+        os.write(fd, data)
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    if size >= METRICS_MAX_BYTES:
+        os.replace(path, path.with_name(METRICS_LOG + ".1"))
+
+
+def iter_metrics(root: Path) -> Iterator[Dict[str, Any]]:
+    directory = events_dir(root)
+    for path in (directory / (METRICS_LOG + ".1"), directory / METRICS_LOG):
+        if not path.exists():
+            continue
+        with path.open("rb") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def counter_path(root: Path, session_id: str) -> Path:
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in session_id)[:128]
+    return events_dir(root) / COUNTERS_DIR / f"{name}.edits"
+
+
+def increment_counter(root: Path, session_id: str) -> None:
+    """Count one design edit for the session; a 1-byte O_APPEND write needs no lock."""
+    path = counter_path(root, session_id)
+    fd = open_in(path.parent, path.name, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    try:
+        os.write(fd, b".")
+    finally:
+        os.close(fd)
+
+
+def read_counter(root: Path, session_id: str) -> int:
+    try:
+        return counter_path(root, session_id).stat().st_size
+    except OSError:
+        return 0
+
+
+def prune_counters(root: Path, max_age_days: float = COUNTER_MAX_AGE_DAYS) -> None:
+    """Remove counters of sessions that have not had a design edit for `max_age_days`."""
+    cutoff = time.time() - max_age_days * 86400
+    try:
+        entries = list(os.scandir(events_dir(root) / COUNTERS_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.name.endswith(".edits") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            continue
+
+
@@ -0,0 +1,55 @@
+"""The built-in YAML subset parser must agree with PyYAML on trace sessions."""
+from pathlib import Path
+
+import pytest
+
+import trace_graph
+
+yaml = pytest.importorskip("yaml")
+
+TEMPLATES = sorted((Path(__file__).resolve().parent.parent / "templates").glob("*.yaml"))
+
+CASES = {
+    "multi-line flow sequence": (
+        "decisions:\n"
+        "  - id: RD-DD-001\n"
+        "    depends_on: [RD-DD-002,\n"
+        "      RD-O-001]\n"
+        "    status: active\n"
+    ),
+    "flow sequence over three lines with comments": (
+        "depends_on: [RD-DD-001,  # first\n"
+        "  RD-O-001,\n"
+        "  RD-A-002]  # last\n"
+        "title: after\n"
+    ),
+    "multi-line flow mapping": (
+        "target: {id: RD-DD-001,\n"
+        "  kind: decision}\n"
+    ),
+    "flow sequence on the line after its key": (
+        "depends_on:\n"
+        "  [RD-DD-001, RD-O-001]\n"
+    ),
+    "single-quote escape before a hash": "title: 'it''s # not a comment'\nnext: 1\n",
+    "single-quote escape in a flow sequence": "tags: ['it''s', 'a # b']\n",
+    "double-quote escape before a hash": 'title: "say \\"hi\\" # not a comment"\n',
+    "comment after a quoted scalar": "title: 'a' # comment\n",
+    "multi-line quoted scalar": "title: 'first\n  second'\n",
+}
+
+
+@pytest.mark.parametrize("text", CASES.values(), ids=CASES.keys())
+def test_subset_parser_matches_pyyaml(text):
+    assert trace_graph.parse_yaml_subset(text) == yaml.safe_load(text)
+
+
+@pytest.mark.parametrize("path", TEMPLATES, ids=[p.name for p in TEMPLATES])
+def test_subset_parser_matches_pyyaml_on_templates(path):
+    text = path.read_text(encoding="utf-8")
+    assert trace_graph.parse_yaml_subset(text) == yaml.safe_load(text)
+
+
+def test_subset_parser_rejects_what_it_cannot_parse():
+    with pytest.raises(ValueError, match="line 2"):
+        trace_graph.parse_yaml_subset("a: 1\n? complex key\n")